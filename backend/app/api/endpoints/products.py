@@ -1,10 +1,17 @@
 from fastapi import APIRouter, HTTPException
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime, timedelta
 from ...schemas.schemas import (
-    Product, ProductCreate, PriceComparisonBase
+    Product, ProductCreate, PriceComparisonBase, WatchRequest, BarcodeBatchRequest
 )
-from ...db.storage import quotes_db
+from ...core.config import settings
+from ...services.tracking.history_store import (
+    PriceHistoryStore, price_history_store, choose_resolution,
+    RESOLUTION_RAW, RESOLUTION_DAY, RESOLUTION_WEEK
+)
+from ...services.tracking.price_tracker import price_tracker
+from ...services.catalog.product_index import product_index
+from ...services.catalog.barcode import BarcodeResolver, classify
 import random
 
 router = APIRouter(prefix="/products", tags=["Prodotti"])
@@ -23,8 +30,8 @@ products_db = {
             "battery": "70 giorni"
         }
     },
-    "5099206085972": {
-        "barcode": "5099206085972",
+    "5099206085978": {
+        "barcode": "5099206085978",
         "name": "Monitor Dell 27\" UltraSharp",
         "category": "Informatica",
         "brand": "Dell",
@@ -37,8 +44,55 @@ products_db = {
     }
 }
 
-# Mock storico prezzi
-price_history_db = {}
+# Indice di ricerca sul catalogo (aggiornato a ogni create_product)
+product_index.add_many(products_db.items())
+
+
+def _history_store(barcode: str, days: int) -> Tuple[PriceHistoryStore, bool]:
+    """Storico reale dal tracker; simulato solo se il prodotto non è mai stato tracciato"""
+    if price_history_store.has_history(barcode):
+        return price_history_store, False
+    
+    simulated = PriceHistoryStore()
+    for point in generate_price_history(barcode, days=days):
+        simulated.record(barcode, point["source"], point["price"], point["availability"], datetime.fromisoformat(point["date"]))
+    return simulated, True
+
+
+async def _lookup_products(keys: List[str]) -> Dict[str, dict]:
+    """Ricerca unica nel catalogo per i miss del resolver (chiavi EAN-13 normalizzate)"""
+    found = {}
+    for key in keys:
+        product = products_db.get(key)
+        if product is None and len(key) == 13 and key.startswith("0"):
+            product = products_db.get(key[1:])  # prodotto registrato come UPC-A
+        if product is not None:
+            found[key] = product
+    return found
+
+
+barcode_resolver = BarcodeResolver(max_entries=settings.BARCODE_CACHE_SIZE, lookup_many=_lookup_products)
+
+
+@router.post("/barcode/batch")
+async def lookup_barcodes(request: BarcodeBatchRequest):
+    """
+    Lookup di molti barcode in una sola chiamata (sessioni di scansione)
+    
+    Cifra di controllo EAN-13/UPC-A/EAN-8 verificata prima del lookup;
+    i risultati sono nello stesso ordine dei codici inviati.
+    """
+    if len(request.barcodes) > settings.BARCODE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Massimo {settings.BARCODE_BATCH_MAX} barcode per richiesta")
+    
+    results = await barcode_resolver.resolve_many(request.barcodes)
+    return {
+        "results": results,
+        "total": len(results),
+        "valid": sum(1 for r in results if r["valid"]),
+        "found": sum(1 for r in results if r["found"]),
+        "cache": barcode_resolver.stats()
+    }
 
 
 @router.get("/barcode/{barcode}")
@@ -48,16 +102,27 @@ async def lookup_barcode(barcode: str):
     
     Supporta: EAN-13, UPC-A, Code 128
     """
-    if barcode in products_db:
-        product = products_db[barcode]
+    resolved = (await barcode_resolver.resolve_many([barcode]))[0]
+    if not resolved["valid"]:
+        return {
+            "found": False,
+            "barcode": barcode,
+            "message": f"Barcode non valido: {resolved['error']}"
+        }
+    
+    if resolved["found"]:
+        product = resolved["product"]
+        product_key = product.get("barcode") or barcode
         
-        # Genera storico prezzi ultimi 30 giorni
-        history = generate_price_history(barcode, days=30)
+        # Storico prezzi ultimi 30 giorni
+        store, simulated = _history_store(product_key, days=30)
+        history = store.history(product_key, days=30)
         
         return {
             "found": True,
             "product": product,
             "price_history": history,
+            "simulated_history": simulated,
             "current_best_price": min(history, key=lambda x: x["price"]) if history else None
         }
     
@@ -72,24 +137,23 @@ async def lookup_barcode(barcode: str):
 async def search_products(
     q: str,
     category: Optional[str] = None,
-    limit: int = 10
+    brand: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0
 ):
     """
-    Ricerca prodotti per nome/descrizione
-    """
-    results = []
+    Ricerca prodotti per nome, brand, categoria, SKU o barcode
     
-    query_lower = q.lower()
-    for barcode, product in products_db.items():
-        if query_lower in product["name"].lower() or query_lower in product.get("category", "").lower():
-            if category and product.get("category") != category:
-                continue
-            results.append(product)
+    Indice invertito con match per prefisso e tolleranza ai refusi;
+    **category** e **brand** filtrano i risultati, le faccette contano i match.
+    """
+    found = product_index.search(q, filters={"category": category, "brand": brand}, limit=limit, offset=offset)
     
     return {
         "query": q,
-        "results": results[:limit],
-        "total": len(results)
+        "results": found["results"],
+        "total": found["total"],
+        "facets": found["facets"]
     }
 
 
@@ -97,55 +161,117 @@ async def search_products(
 async def get_price_history(
     barcode: str,
     days: int = 90,
-    source: Optional[str] = None
+    source: Optional[str] = None,
+    resolution: Optional[str] = None
 ):
     """
     Storico prezzi prodotto
     
     - **days**: Giorni di storico (default 90)
     - **source**: Filtra per fonte specifica (amazon, eprice, etc)
+    - **resolution**: raw, day o week; di default la più grossolana adeguata alla finestra
     """
-    if barcode not in products_db:
+    if barcode not in products_db and not price_history_store.has_history(barcode):
         raise HTTPException(status_code=404, detail="Prodotto non trovato")
     
-    history = generate_price_history(barcode, days=days)
+    resolution = resolution or choose_resolution(days)
+    if resolution not in (RESOLUTION_RAW, RESOLUTION_DAY, RESOLUTION_WEEK):
+        raise HTTPException(status_code=400, detail="Risoluzione non valida (raw, day, week)")
     
-    if source:
-        history = [h for h in history if h["source"] == source]
+    store, simulated = _history_store(barcode, days=days)
+    if resolution == RESOLUTION_RAW:
+        history = store.history(barcode, days=days, source=source)
+    else:
+        # Rollup giornalieri/settimanali: O(bucket) invece di O(punti)
+        history = store.rollup(barcode, resolution, days=days, source=source)
     
-    # Calcola statistiche
-    prices = [h["price"] for h in history]
-    stats = {
-        "min_price": min(prices) if prices else None,
-        "max_price": max(prices) if prices else None,
-        "avg_price": sum(prices) / len(prices) if prices else None,
-        "current_price": prices[-1] if prices else None,
-        "trend": "down" if len(prices) > 1 and prices[-1] < prices[0] else "up" if len(prices) > 1 and prices[-1] > prices[0] else "stable"
-    }
+    stats = store.aggregate(barcode, days=days, source=source, resolution=resolution)
     
     return {
-        "product": products_db[barcode],
+        "product": products_db.get(barcode),
         "history": history,
         "stats": stats,
-        "period_days": days
+        "period_days": days,
+        "resolution": resolution,
+        "simulated": simulated,
+        "last_checked": price_history_store.last_checked(barcode)
     }
 
 
+@router.post("/watch")
+async def watch_product(request: WatchRequest):
+    """
+    Aggiunge un prodotto al monitoraggio prezzi
+    
+    - **barcode** e/o **query**: con solo il barcode di un prodotto a catalogo si usa il suo nome
+    - **interval_minutes**: intervallo di base (adattato alla volatilità)
+    """
+    query = request.query
+    if not query and request.barcode in products_db:
+        query = products_db[request.barcode]["name"]
+    if not query:
+        raise HTTPException(status_code=400, detail="Specificare una query o il barcode di un prodotto a catalogo")
+    
+    item = await price_tracker.watch(
+        query=query,
+        barcode=request.barcode,
+        sources=request.sources,
+        interval=request.interval_minutes * 60 if request.interval_minutes else None
+    )
+    return price_tracker.describe(item)
+
+
+@router.get("/watch")
+async def list_watched():
+    """Prodotti monitorati, dal più urgente da aggiornare"""
+    await price_tracker.load()  # aggiunte/rimozioni ricevute da altri worker
+    due = {item.key for item in price_tracker.due_items()}
+    return {
+        "watched": [
+            {**price_tracker.describe(item), "due": item.key in due}
+            for item in price_tracker.watchlist.values()
+        ],
+        "stats": price_tracker.stats()
+    }
+
+
+@router.delete("/watch/{key}")
+async def unwatch_product(key: str):
+    """Rimuove un prodotto dal monitoraggio (lo storico resta)"""
+    if not await price_tracker.unwatch(key):
+        raise HTTPException(status_code=404, detail="Prodotto non monitorato")
+    return {"message": "Monitoraggio rimosso", "key": key}
+
+
 @router.post("/")
 async def create_product(product: ProductCreate):
-    """Crea nuovo prodotto nel catalogo"""
+    """
+    Crea nuovo prodotto nel catalogo
     
-    if product.barcode and product.barcode in products_db:
-        raise HTTPException(status_code=400, detail="Prodotto già esistente")
+    Il barcode viene validato e salvato nella forma normalizzata usata dal
+    lookup (UPC-A come EAN-13), così il prodotto è subito trovabile
+    """
+    barcode = None
+    if product.barcode:
+        _, barcode, error = classify(product.barcode)
+        if error:
+            raise HTTPException(status_code=422, detail=f"Barcode non valido: {error}")
+        if (await _lookup_products([barcode])).get(barcode):
+            raise HTTPException(status_code=400, detail="Prodotto già esistente")
     
     product_id = len(products_db) + 1
-    products_db[product.barcode or str(product_id)] = {
+    key = barcode or str(product_id)
+    products_db[key] = {
         "id": product_id,
         **product.model_dump(),
+        "barcode": barcode,
         "created_at": datetime.utcnow()
     }
+    product_index.add(key, products_db[key])
+    if barcode:
+        barcode_resolver.invalidate(barcode)
     
-    return products_db[product.barcode or str(product_id)]
+    return products_db[key]
 
 
 def generate_price_history(barcode: str, days: int = 30) -> List[dict]:
@@ -185,16 +311,14 @@ def generate_price_history(barcode: str, days: int = 30) -> List[dict]:
 @router.get("/categories")
 async def list_categories():
     """Lista tutte le categorie prodotti"""
-    categories = list(set(p.get("category", "Altro") for p in products_db.values()))
     return {
-        "categories": sorted(categories)
+        "categories": product_index.facet_values("category")
     }
 
 
 @router.get("/brands")
 async def list_brands():
     """Lista tutti i brand"""
-    brands = list(set(p.get("brand", "Unknown") for p in products_db.values()))
     return {
-        "brands": sorted(brands)
+        "brands": product_index.facet_values("brand")
     }
@@ -1,17 +1,18 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends
-from typing import List, Optional
+from typing import Optional
 import aiofiles
 import os
-from datetime import datetime
 import uuid
 
 from ...schemas.schemas import (
-    Quote, QuoteCreate, QuoteDetail, QuoteStatus,
+    QuoteCreate, QuoteDetail, QuoteItem, QuotePage, QuoteStatus,
     UploadResponse, OCRResult
 )
 from ...services.ocr.ocr_service import ocr_service
 from ...core.config import settings
-from ...db.storage import quotes_db
+from ...db.database import get_session, session_scope
+from ...db.repositories import QuoteRepository, quote_detail
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/quotes", tags=["Preventivi"])
 
@@ -19,7 +20,8 @@ router = APIRouter(prefix="/quotes", tags=["Preventivi"])
 @router.post("/upload", response_model=UploadResponse)
 async def upload_quote(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    background_tasks: BackgroundTasks = None,
+    session: AsyncSession = Depends(get_session)
 ):
     """
     Upload preventivo PDF/immagine per estrazione OCR
@@ -51,17 +53,8 @@ async def upload_quote(
         await f.write(content)
     
     # Crea record quote
-    quote_id = len(quotes_db) + 1
-    quotes_db[quote_id] = {
-        "id": quote_id,
-        "original_filename": file.filename,
-        "file_path": file_path,
-        "status": QuoteStatus.PROCESSING,
-        "created_at": datetime.utcnow(),
-        "items": [],
-        "extracted_data": None,
-        "ocr_confidence": None
-    }
+    quote = await QuoteRepository(session).create(file.filename, file_path)
+    quote_id = quote.id
     
     # Process OCR in background
     if background_tasks:
@@ -76,107 +69,115 @@ async def upload_quote(
     )
 
 
+@router.get("/ocr/stats")
+async def ocr_stats():
+    """Statistiche OCR (pool di processi, tempi per pagina)"""
+    return ocr_service.stats()
+
+
 async def process_ocr(quote_id: int, file_bytes: bytes, filename: str):
     """Background task per OCR processing"""
     try:
         result = await ocr_service.process_document(file_bytes, filename)
         
-        quotes_db[quote_id].update({
-            "status": QuoteStatus.ANALYZED,
-            "raw_text": result.raw_text,
-            "ocr_confidence": result.confidence,
-            "extracted_data": {
-                "supplier": result.supplier_info,
-                "total": result.total_amount,
-                "date": result.quote_date
-            },
-            "items": [item.model_dump() for item in result.extracted_items]
-        })
+        async with session_scope() as session:
+            await QuoteRepository(session).save_ocr_result(quote_id, result)
         
     except Exception as e:
-        quotes_db[quote_id].update({
-            "status": QuoteStatus.ERROR,
-            "error": str(e)
-        })
+        async with session_scope() as session:
+            await QuoteRepository(session).set_error(quote_id, str(e))
 
 
-@router.get("/", response_model=List[Quote])
+@router.get("/", response_model=QuotePage)
 async def list_quotes(
     status: Optional[QuoteStatus] = None,
-    skip: int = 0,
-    limit: int = 20
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    session: AsyncSession = Depends(get_session)
 ):
-    """Lista tutti i preventivi"""
-    quotes = list(quotes_db.values())
-    
-    if status:
-        quotes = [q for q in quotes if q["status"] == status]
+    """
+    Lista preventivi, più recenti prima
     
-    return quotes[skip:skip + limit]
+    - **cursor**: `next_cursor` della pagina precedente (assente per la prima)
+    """
+    try:
+        return await QuoteRepository(session).page(status=status, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{quote_id}", response_model=QuoteDetail)
-async def get_quote(quote_id: int):
+async def get_quote(quote_id: int, session: AsyncSession = Depends(get_session)):
     """Dettaglio singolo preventivo con items e comparazioni"""
-    if quote_id not in quotes_db:
+    quote = await QuoteRepository(session).get_detail(quote_id)
+    if not quote:
         raise HTTPException(status_code=404, detail="Preventivo non trovato")
     
-    return quotes_db[quote_id]
+    return quote_detail(quote)
 
 
 @router.delete("/{quote_id}")
-async def delete_quote(quote_id: int):
+async def delete_quote(quote_id: int, session: AsyncSession = Depends(get_session)):
     """Elimina preventivo"""
-    if quote_id not in quotes_db:
+    repository = QuoteRepository(session)
+    quote = await repository.get(quote_id)
+    if not quote:
         raise HTTPException(status_code=404, detail="Preventivo non trovato")
     
     # Rimuovi file
-    file_path = quotes_db[quote_id].get("file_path")
+    file_path = quote.file_path
     if file_path and os.path.exists(file_path):
         os.remove(file_path)
     
-    del quotes_db[quote_id]
+    await repository.delete(quote_id)
     return {"message": "Preventivo eliminato"}
 
 
 @router.post("/{quote_id}/reprocess")
-async def reprocess_quote(quote_id: int, background_tasks: BackgroundTasks):
+async def reprocess_quote(
+    quote_id: int,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session)
+):
     """Rielabora OCR per un preventivo"""
-    if quote_id not in quotes_db:
+    repository = QuoteRepository(session)
+    quote = await repository.get(quote_id)
+    if not quote:
         raise HTTPException(status_code=404, detail="Preventivo non trovato")
     
-    file_path = quotes_db[quote_id].get("file_path")
+    file_path = quote.file_path
     if not file_path or not os.path.exists(file_path):
         raise HTTPException(status_code=400, detail="File originale non disponibile")
     
     async with aiofiles.open(file_path, 'rb') as f:
         content = await f.read()
     
-    quotes_db[quote_id]["status"] = QuoteStatus.PROCESSING
+    await repository.set_status(quote_id, QuoteStatus.PROCESSING)
     
     background_tasks.add_task(
         process_ocr, 
         quote_id, 
         content, 
-        quotes_db[quote_id]["original_filename"]
+        quote.original_filename
     )
     
     return {"message": "Rielaborazione avviata"}
 
 
 @router.patch("/{quote_id}/items/{item_index}")
-async def update_quote_item(quote_id: int, item_index: int, updates: dict):
+async def update_quote_item(
+    quote_id: int,
+    item_index: int,
+    updates: dict,
+    session: AsyncSession = Depends(get_session)
+):
     """Modifica manuale item preventivo (correzione OCR)"""
-    if quote_id not in quotes_db:
+    repository = QuoteRepository(session)
+    if not await repository.get(quote_id):
         raise HTTPException(status_code=404, detail="Preventivo non trovato")
     
-    items = quotes_db[quote_id].get("items", [])
-    if item_index >= len(items):
+    item = await repository.update_item(quote_id, item_index, updates)
+    if not item:
         raise HTTPException(status_code=404, detail="Item non trovato")
     
-    # Update fields
-    for key, value in updates.items():
-        if key in items[item_index]:
-            items[item_index][key] = value
-    
-    return items[item_index]
+    return QuoteItem.model_validate(item)
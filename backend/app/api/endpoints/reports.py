@@ -1,11 +1,12 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Body
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Body, Depends
 from typing import Optional
-from datetime import datetime
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...schemas.schemas import ReportRequest, ReportResponse
 from ...services.ai.ai_service import ai_service
-from ...db.storage import reports_db, quotes_db
+from ...db.database import async_session, get_session
+from ...db.repositories import QuoteRepository, ReportRepository, report_to_dict
 
 router = APIRouter(prefix="/reports", tags=["Report AI"])
 
@@ -28,67 +29,76 @@ async def generate_report(request: ReportRequest):
     - **report_type**: Tipo report (comparison, analysis, recommendation)
     - **include_charts**: Includi grafici nel report
     """
-    if request.quote_id not in quotes_db:
-        raise HTTPException(status_code=404, detail="Preventivo non trovato")
-    
-    quote = quotes_db[request.quote_id]
-    
-    if quote.get("status") not in ["analyzed", "compared", "completed"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="Il preventivo deve essere prima analizzato"
-        )
-    
-    # Prepara dati per AI
-    price_comparisons = quote.get("price_comparisons", [])
+    # Dati per l'AI estratti in una sessione breve: nessuna connessione resta occupata
+    # durante la chiamata al modello, e nessun oggetto ORM staccato esce dalla sessione
+    async with async_session() as session:
+        quote = await QuoteRepository(session).get_detail(request.quote_id)
+        if not quote:
+            raise HTTPException(status_code=404, detail="Preventivo non trovato")
+        
+        if quote.status not in ["analyzed", "compared", "completed"]:
+            raise HTTPException(
+                status_code=400, 
+                detail="Il preventivo deve essere prima analizzato"
+            )
+        
+        quote_data = {
+            "id": quote.id,
+            "supplier": {"name": quote.supplier.name} if quote.supplier else {},
+            "items": [
+                {
+                    "id": item.id,
+                    "description": item.description or "",
+                    "unit_price": item.unit_price or 0,
+                    "quantity": item.quantity or 1,
+                }
+                for item in quote.items
+            ],
+        }
+        price_comparisons = [
+            {
+                "item_id": item.id,
+                "results": [{"source": c.source, "price": c.price} for c in item.price_comparisons],
+            }
+            for item in quote.items
+        ]
     
     # Genera report
     report_data = await ai_service.generate_comparison_report(
-        quote=quote,
+        quote=quote_data,
         price_comparisons=price_comparisons
     )
     
-    # Salva report
-    report_id = len(reports_db) + 1
-    report = {
-        "id": report_id,
-        "quote_id": request.quote_id,
-        "report_type": request.report_type,
-        "created_at": datetime.utcnow(),
-        **report_data
-    }
-    
-    reports_db[report_id] = report
+    # Salva report (e segna il preventivo come completato)
+    async with async_session() as session:
+        report = await ReportRepository(session).create(request.quote_id, request.report_type, report_data)
     
-    # Update quote status
-    quotes_db[request.quote_id]["status"] = "completed"
-    quotes_db[request.quote_id]["report_id"] = report_id
-    
-    return report
+    return report_to_dict(report)
 
 
 @router.get("/{report_id}")
-async def get_report(report_id: int):
+async def get_report(report_id: int, session: AsyncSession = Depends(get_session)):
     """Recupera un report generato"""
-    if report_id not in reports_db:
+    report = await ReportRepository(session).get(report_id)
+    if not report:
         raise HTTPException(status_code=404, detail="Report non trovato")
     
-    return reports_db[report_id]
+    return report_to_dict(report)
 
 
 @router.get("/")
 async def list_reports(
     quote_id: Optional[int] = None,
-    skip: int = 0,
-    limit: int = 20
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    session: AsyncSession = Depends(get_session)
 ):
-    """Lista tutti i report"""
-    reports = list(reports_db.values())
-    
-    if quote_id:
-        reports = [r for r in reports if r.get("quote_id") == quote_id]
-    
-    return reports[skip:skip + limit]
+    """Lista report, più recenti prima (paginazione con `next_cursor`)"""
+    try:
+        page = await ReportRepository(session).page(quote_id=quote_id, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**page, "items": [report_to_dict(report) for report in page["items"]]}
 
 
 @router.post("/analyze-image")
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from datetime import datetime
+import json
 import time
 
 from ...schemas.schemas import (
@@ -8,10 +10,15 @@ from ...schemas.schemas import (
     PriceComparisonBase
 )
 from ...services.scraper.scraper_service import scraper_service
-from ...db.storage import search_cache, quotes_db
+from ...services.scraper.sources import list_sources as registered_sources
+from ...services.scraper.bulk_search import bulk_search_service
+from ...db.database import async_session, session_scope
+from ...db.repositories import QuoteRepository
 
 router = APIRouter(prefix="/search", tags=["Ricerca Prezzi"])
 
+QUOTE_DEFAULT_SOURCES = ["amazon", "eprice", "trovaprezzi"]
+
 
 @router.post("/", response_model=SearchResponse)
 async def search_prices(request: ScrapeRequest):
@@ -25,46 +32,85 @@ async def search_prices(request: ScrapeRequest):
     """
     start_time = time.time()
     
-    # Check cache
-    cache_key = f"{request.query}:{request.barcode}:{','.join(sorted(request.sources))}"
-    if cache_key in search_cache:
-        cached = search_cache[cache_key]
-        if (datetime.utcnow() - cached["timestamp"]).seconds < 3600:  # 1 hour cache
-            return cached["data"]
-    
-    # Esegui scraping
+    # Esegui scraping (cache per fonte gestita dallo scraper)
     results = await scraper_service.search_all_sources(
         query=request.query,
         barcode=request.barcode,
         sources=request.sources
     )
     
-    # Trova miglior prezzo
-    all_prices = []
-    for result in results:
-        if result.success:
-            all_prices.extend(result.results)
-    
-    best_price = None
-    if all_prices:
-        best_price = min(all_prices, key=lambda x: x.price)
-    
     search_time = int((time.time() - start_time) * 1000)
     
-    response = SearchResponse(
+    return SearchResponse(
         query=request.query,
         results=results,
-        best_price=best_price,
+        best_price=_best_price(results),
         search_time_ms=search_time
     )
+
+
+def _best_price(results: List[ScrapeResult]) -> Optional[PriceComparisonBase]:
+    """Trova miglior prezzo tra le fonti riuscite"""
+    all_prices = []
+    for result in results:
+        if result.success:
+            all_prices.extend(result.results)
     
-    # Cache result
-    search_cache[cache_key] = {
-        "timestamp": datetime.utcnow(),
-        "data": response
-    }
+    if not all_prices:
+        return None
+    return min(all_prices, key=lambda x: x.price)
+
+
+def _format_event(event: str, data: dict, fmt: str) -> str:
+    data = jsonable_encoder(data)
+    if fmt == "ndjson":
+        return json.dumps({"type": event, "data": data}) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_search(request: ScrapeRequest, fmt: str) -> StreamingResponse:
+    """
+    Risposta in streaming: un evento `result` per fonte appena completata,
+    poi un evento finale `best_price`
+    """
+    async def generate():
+        start_time = time.time()
+        results = []
+        async for result in scraper_service.iter_search_all_sources(
+            query=request.query,
+            barcode=request.barcode,
+            sources=request.sources
+        ):
+            results.append(result)
+            yield _format_event("result", result.model_dump(), fmt)
+        
+        best_price = _best_price(results)
+        yield _format_event("best_price", {
+            "query": request.query,
+            "best_price": best_price.model_dump() if best_price else None,
+            "search_time_ms": int((time.time() - start_time) * 1000)
+        }, fmt)
     
-    return response
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/stream")
+async def search_prices_stream(
+    request: ScrapeRequest,
+    format: str = Query("sse", pattern="^(sse|ndjson)$", description="sse oppure ndjson")
+):
+    """
+    Cerca prezzi su multiple fonti in streaming (SSE o NDJSON)
+    
+    Ogni fonte viene inviata appena pronta; le fonti oltre la
+    deadline vengono riportate con `timed_out: true`.
+    """
+    return _stream_search(request, format)
 
 
 @router.get("/quick")
@@ -88,47 +134,73 @@ async def quick_search(
     return await search_prices(request)
 
 
+@router.get("/quick/stream")
+async def quick_search_stream(
+    q: str = Query(..., min_length=2, description="Termine di ricerca"),
+    barcode: Optional[str] = Query(None, description="Barcode EAN/UPC"),
+    sources: str = Query("amazon,eprice,trovaprezzi", description="Fonti separate da virgola"),
+    format: str = Query("sse", pattern="^(sse|ndjson)$", description="sse oppure ndjson")
+):
+    """
+    Ricerca veloce prezzi in streaming (GET, compatibile con EventSource)
+    """
+    source_list = [s.strip() for s in sources.split(",")]
+    
+    request = ScrapeRequest(
+        query=q,
+        barcode=barcode,
+        sources=source_list,
+        max_results=5
+    )
+    
+    return _stream_search(request, format)
+
+
+async def _quote_items(quote_id: int) -> list:
+    """
+    Item del preventivo letti in una sessione breve: la connessione torna al pool
+    prima della ricerca, che può durare minuti
+    """
+    async with async_session() as session:
+        repository = QuoteRepository(session)
+        if not await repository.get(quote_id):
+            raise HTTPException(status_code=404, detail="Preventivo non trovato")
+        
+        items = [
+            {"id": item.id, "description": item.description, "barcode": item.barcode, "sku": item.sku}
+            for item in await repository.items(quote_id)
+        ]
+    if not items:
+        raise HTTPException(status_code=400, detail="Nessun item nel preventivo")
+    return items
+
+
+async def _save_quote_comparisons(quote_id: int, items: list, all_results: list):
+    """Salva i confronti (bulk) in una sessione propria: può girare dopo la risposta"""
+    comparisons = {items[r["item_index"]]["id"]: r["results"] for r in all_results}
+    async with session_scope() as session:
+        await QuoteRepository(session).save_comparisons(quote_id, comparisons)
+
+
 @router.post("/quote/{quote_id}")
 async def search_quote_prices(
     quote_id: int,
-    background_tasks: BackgroundTasks,
     sources: List[str] = None
 ):
     """
     Cerca prezzi per tutti gli items di un preventivo
-    """
-    if quote_id not in quotes_db:
-        raise HTTPException(status_code=404, detail="Preventivo non trovato")
-    
-    quote = quotes_db[quote_id]
-    items = quote.get("items", [])
     
-    if not items:
-        raise HTTPException(status_code=400, detail="Nessun item nel preventivo")
+    Gli item identici vengono cercati una sola volta e le ricerche
+    procedono in parallelo con budget globale e per fonte.
+    """
+    items = await _quote_items(quote_id)
     
-    # Cerca prezzi per ogni item
-    all_results = []
+    all_results = await bulk_search_service.search(
+        items, sources or QUOTE_DEFAULT_SOURCES
+    )
     
-    for i, item in enumerate(items):
-        query = item.get("description", "")
-        barcode = item.get("barcode")
-        
-        if query or barcode:
-            results = await scraper_service.search_all_sources(
-                query=query,
-                barcode=barcode,
-                sources=sources or ["amazon", "eprice", "trovaprezzi"]
-            )
-            
-            all_results.append({
-                "item_index": i,
-                "item_description": query,
-                "results": results
-            })
-    
-    # Update quote status
-    quotes_db[quote_id]["status"] = "compared"
-    quotes_db[quote_id]["price_comparisons"] = all_results
+    # Salva confronti e aggiorna lo stato del preventivo
+    await _save_quote_comparisons(quote_id, items, all_results)
     
     return {
         "quote_id": quote_id,
@@ -137,47 +209,80 @@ async def search_quote_prices(
     }
 
 
+@router.post("/quote/{quote_id}/stream")
+async def stream_quote_prices(
+    quote_id: int,
+    sources: List[str] = None
+):
+    """
+    Come /quote/{quote_id}, ma invia i risultati per item (NDJSON)
+    appena sono pronti; l'ultima riga contiene il riepilogo
+    """
+    items = await _quote_items(quote_id)
+    
+    async def generate():
+        all_results = []
+        async for result in bulk_search_service.iter_search(items, sources or QUOTE_DEFAULT_SOURCES):
+            all_results.append(result)
+            yield json.dumps(jsonable_encoder({"type": "item", **result})) + "\n"
+        
+        all_results.sort(key=lambda r: r["item_index"])
+        await _save_quote_comparisons(quote_id, items, all_results)
+        yield json.dumps({"type": "done", "quote_id": quote_id, "items_searched": len(all_results)}) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.post("/quote/{quote_id}/jobs", status_code=202)
+async def start_quote_search_job(
+    quote_id: int,
+    sources: List[str] = None
+):
+    """Avvia la ricerca prezzi del preventivo in background"""
+    items = await _quote_items(quote_id)
+    
+    job = await bulk_search_service.start_job(
+        items,
+        sources or QUOTE_DEFAULT_SOURCES,
+        quote_id=quote_id,
+        on_complete=lambda results: _save_quote_comparisons(quote_id, items, results)
+    )
+    
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "total": job["total"]
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_search_job(job_id: str):
+    """Stato di una ricerca bulk in background (con risultati parziali)"""
+    job = await bulk_search_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job non trovato")
+    return job
+
+
 @router.get("/sources")
 async def list_sources():
-    """Lista fonti disponibili per la ricerca"""
+    """Lista fonti disponibili per la ricerca, con stato circuit breaker e latenze"""
     return {
         "sources": [
-            {
-                "id": "amazon",
-                "name": "Amazon.it",
-                "description": "Marketplace principale",
-                "reliability": "alta"
-            },
-            {
-                "id": "eprice",
-                "name": "ePRICE",
-                "description": "Elettronica e tech",
-                "reliability": "alta"
-            },
-            {
-                "id": "unieuro",
-                "name": "Unieuro",
-                "description": "Elettronica consumer",
-                "reliability": "media"
-            },
-            {
-                "id": "mediaworld",
-                "name": "MediaWorld",
-                "description": "Elettronica e elettrodomestici",
-                "reliability": "media"
-            },
-            {
-                "id": "trovaprezzi",
-                "name": "TrovaPrezzi",
-                "description": "Aggregatore multi-shop",
-                "reliability": "alta"
-            }
+            {**adapter.describe(), "health": scraper_service.health.source_stats(adapter.id)}
+            for adapter in registered_sources()
         ]
     }
 
 
+@router.get("/stats")
+async def scraper_stats():
+    """Statistiche runtime dello scraper (pool context, code, riutilizzi)"""
+    return scraper_service.stats()
+
+
 @router.delete("/cache")
 async def clear_cache():
     """Pulisce la cache delle ricerche"""
-    search_cache.clear()
+    await scraper_service.cache.clear()
     return {"message": "Cache pulita"}
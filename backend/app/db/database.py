@@ -0,0 +1,62 @@
+"""
+Connessione PostgreSQL (SQLAlchemy async + asyncpg)
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from ..core.config import settings
+from ..models.models import Base
+
+logger = logging.getLogger(__name__)
+
+# Un pool per processo (ogni worker uvicorn ha il suo)
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=settings.DB_ECHO,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    connect_args={
+        "command_timeout": settings.DB_COMMAND_TIMEOUT,
+        "server_settings": {
+            "application_name": settings.APP_NAME.lower(),
+            "jit": "off",  # query OLTP brevi: la compilazione JIT costa più di quanto fa risparmiare
+        },
+    },
+)
+
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """Dependency FastAPI: una sessione per richiesta (i repository fanno commit esplicito)"""
+    async with async_session() as session:
+        yield session
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """Sessione per task in background: commit a fine blocco, rollback in caso di errore"""
+    async with async_session() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def init_db():
+    """Crea le tabelle mancanti (MVP: nessuna migrazione Alembic ancora)"""
+    if settings.DB_CREATE_TABLES:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+
+async def close_db():
+    await engine.dispose()
@@ -0,0 +1,329 @@
+"""
+Repository async su PostgreSQL per preventivi, item, confronti prezzi e report
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import base64
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from ..core.config import settings
+from ..models.models import Quote, QuoteItem, PriceComparison, Report, QuoteStatus
+from ..schemas.schemas import OCRResult, ScrapeResult
+
+# Campi dell'item modificabili a mano (correzione OCR)
+EDITABLE_ITEM_FIELDS = {
+    "description", "sku", "barcode", "quantity", "unit", "unit_price",
+    "total_price", "discount_percent", "vat_percent", "notes",
+}
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _columns(obj) -> dict:
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+# === PAGINAZIONE ===
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Cursore opaco sull'ultima riga della pagina: (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """ValueError se il cursore non è valido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError("Cursore non valido") from e
+
+
+async def _keyset_page(session: AsyncSession, model, conditions: list, cursor: Optional[str], limit: int):
+    """
+    Pagina più-recenti-prima su (created_at, id): la pagina N costa quanto la prima
+    (range scan sull'indice composito, niente OFFSET)
+    """
+    limit = max(1, min(limit, settings.DB_PAGE_MAX))
+    query = select(model).where(*conditions)
+    if cursor:
+        query = query.where(tuple_(model.created_at, model.id) < decode_cursor(cursor))
+    query = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+    rows = list((await session.execute(query)).scalars())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+class _CountCache:
+    """
+    Totali degli elenchi con TTL: COUNT(*) esatto al più una volta ogni DB_COUNT_TTL
+    secondi per filtro; invalidato dalle scritture di questo processo
+    """
+
+    def __init__(self):
+        self._values: Dict[tuple, Tuple[int, float]] = {}
+
+    async def get(self, session: AsyncSession, model, conditions: list, key: tuple) -> int:
+        key = (model.__tablename__, *key)
+        cached = self._values.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        total = await session.scalar(select(func.count()).select_from(model).where(*conditions))
+        self._values[key] = (total, time.monotonic() + settings.DB_COUNT_TTL)
+        return total
+
+    def invalidate(self, model):
+        for key in [k for k in self._values if k[0] == model.__tablename__]:
+            del self._values[key]
+
+
+_counts = _CountCache()
+
+
+class QuoteRepository:
+    """
+    Accesso ai preventivi
+    - Item e confronti prezzi inseriti in bulk (executemany)
+    - Dettaglio caricato con eager loading: selectin per item e confronti,
+      join per il fornitore (nessun lazy load fuori dalla sessione)
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, original_filename: str, file_path: str) -> Quote:
+        quote = Quote(
+            original_filename=original_filename,
+            file_path=file_path,
+            status=QuoteStatus.PROCESSING
+        )
+        self.session.add(quote)
+        await self.session.commit()
+        await self.session.refresh(quote)
+        _counts.invalidate(Quote)
+        return quote
+
+    async def get(self, quote_id: int) -> Optional[Quote]:
+        return await self.session.get(Quote, quote_id)
+
+    async def get_detail(self, quote_id: int) -> Optional[Quote]:
+        """Preventivo con fornitore, item e confronti prezzi in 3 query"""
+        result = await self.session.execute(
+            select(Quote)
+            .where(Quote.id == quote_id)
+            .options(
+                joinedload(Quote.supplier),
+                selectinload(Quote.items).selectinload(QuoteItem.price_comparisons),
+            )
+        )
+        return result.unique().scalar_one_or_none()
+
+    async def page(
+        self,
+        status: Optional[QuoteStatus] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> dict:
+        """Pagina di preventivi (più recenti prima) con cursore successivo e totale"""
+        conditions = [Quote.status == QuoteStatus(status)] if status else []
+        items, next_cursor = await _keyset_page(self.session, Quote, conditions, cursor, limit)
+        total = await _counts.get(self.session, Quote, conditions, (status,))
+        return {"items": items, "next_cursor": next_cursor, "total": total}
+
+    async def set_status(self, quote_id: int, status: QuoteStatus):
+        await self.session.execute(
+            update(Quote).where(Quote.id == quote_id).values(status=QuoteStatus(status))
+        )
+        await self.session.commit()
+        _counts.invalidate(Quote)
+
+    async def set_error(self, quote_id: int, error: str):
+        await self.session.execute(
+            update(Quote).where(Quote.id == quote_id).values(status=QuoteStatus.ERROR, error=error)
+        )
+        await self.session.commit()
+        _counts.invalidate(Quote)
+
+    async def delete(self, quote_id: int):
+        item_ids = select(QuoteItem.id).where(QuoteItem.quote_id == quote_id)
+        await self.session.execute(delete(PriceComparison).where(PriceComparison.quote_item_id.in_(item_ids)))
+        await self.session.execute(delete(QuoteItem).where(QuoteItem.quote_id == quote_id))
+        await self.session.execute(update(Report).where(Report.quote_id == quote_id).values(quote_id=None))
+        await self.session.execute(delete(Quote).where(Quote.id == quote_id))
+        await self.session.commit()
+        _counts.invalidate(Quote)
+        _counts.invalidate(Report)
+
+    async def save_ocr_result(self, quote_id: int, result: OCRResult):
+        """Dati estratti + item (sostituiti in blocco in caso di rielaborazione)"""
+        await self._delete_items(quote_id)
+        await self.session.execute(
+            update(Quote).where(Quote.id == quote_id).values(
+                status=QuoteStatus.ANALYZED,
+                raw_text=result.raw_text,
+                ocr_confidence=result.confidence,
+                total_amount=result.total_amount,
+                error=None,
+                extracted_data=jsonable_encoder({
+                    "supplier": result.supplier_info,
+                    "total": result.total_amount,
+                    "date": result.quote_date,
+                    "pages": result.pages
+                })
+            )
+        )
+        rows = [{"quote_id": quote_id, **item.model_dump()} for item in result.extracted_items]
+        if rows:
+            await self.session.execute(insert(QuoteItem), rows)
+        await self.session.commit()
+        _counts.invalidate(Quote)
+
+    async def _delete_items(self, quote_id: int):
+        item_ids = select(QuoteItem.id).where(QuoteItem.quote_id == quote_id)
+        await self.session.execute(delete(PriceComparison).where(PriceComparison.quote_item_id.in_(item_ids)))
+        await self.session.execute(delete(QuoteItem).where(QuoteItem.quote_id == quote_id))
+
+    async def items(self, quote_id: int) -> List[QuoteItem]:
+        result = await self.session.execute(
+            select(QuoteItem).where(QuoteItem.quote_id == quote_id).order_by(QuoteItem.id)
+        )
+        return list(result.scalars())
+
+    async def update_item(self, quote_id: int, item_index: int, updates: dict) -> Optional[QuoteItem]:
+        items = await self.items(quote_id)
+        if item_index >= len(items):
+            return None
+        item = items[item_index]
+        for key, value in updates.items():
+            if key in EDITABLE_ITEM_FIELDS:
+                setattr(item, key, value)
+        await self.session.commit()
+        return item
+
+    async def save_comparisons(self, quote_id: int, comparisons: Dict[int, List[ScrapeResult]]):
+        """
+        Sostituisce i confronti prezzi degli item indicati (item_id -> risultati per fonte)
+        con un solo insert multiplo, e segna il preventivo come confrontato
+        """
+        if comparisons:
+            await self.session.execute(
+                delete(PriceComparison).where(PriceComparison.quote_item_id.in_(list(comparisons)))
+            )
+        rows = [
+            {
+                "quote_item_id": item_id,
+                "source": price.source,
+                "source_url": price.source_url,
+                "price": price.price,
+                "currency": price.currency,
+                "availability": price.availability.value if price.availability else None,
+                "shipping_cost": price.shipping_cost,
+                "shipping_time": price.shipping_time,
+                "seller_name": price.seller_name,
+                "seller_rating": price.seller_rating,
+                "scraped_at": _utc(scrape.scraped_at),
+            }
+            for item_id, scrapes in comparisons.items()
+            for scrape in scrapes
+            for price in scrape.results
+        ]
+        if rows:
+            await self.session.execute(insert(PriceComparison), rows)
+        await self.session.execute(
+            update(Quote).where(Quote.id == quote_id).values(status=QuoteStatus.COMPARED)
+        )
+        await self.session.commit()
+        _counts.invalidate(Quote)
+
+
+class ReportRepository:
+    """Accesso ai report generati"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, quote_id: int, report_type: str, data: dict) -> Report:
+        report = Report(
+            quote_id=quote_id,
+            report_type=report_type,
+            title=data.get("title"),
+            summary=data.get("summary"),
+            content=data.get("analysis"),
+            recommendations=jsonable_encoder(data.get("recommendations", [])),
+            details=jsonable_encoder({
+                "risks": data.get("risks", []),
+                "conclusion": data.get("conclusion"),
+                "metrics": data.get("metrics", {}),
+            }),
+            total_savings=(data.get("metrics") or {}).get("total_savings"),
+        )
+        self.session.add(report)
+        await self.session.execute(
+            update(Quote).where(Quote.id == quote_id).values(status=QuoteStatus.COMPLETED)
+        )
+        await self.session.commit()
+        await self.session.refresh(report)
+        _counts.invalidate(Quote)
+        _counts.invalidate(Report)
+        return report
+
+    async def get(self, report_id: int) -> Optional[Report]:
+        return await self.session.get(Report, report_id)
+
+    async def page(self, quote_id: Optional[int] = None, cursor: Optional[str] = None, limit: int = 20) -> dict:
+        conditions = [Report.quote_id == quote_id] if quote_id else []
+        items, next_cursor = await _keyset_page(self.session, Report, conditions, cursor, limit)
+        total = await _counts.get(self.session, Report, conditions, (quote_id,))
+        return {"items": items, "next_cursor": next_cursor, "total": total}
+
+
+def quote_detail(quote: Quote) -> dict:
+    """Preventivo caricato con get_detail -> dict per QuoteDetail (best price e risparmio per item)"""
+    items = []
+    for item in quote.items:
+        comparisons = [_columns(c) for c in item.price_comparisons]
+        best = min((c["price"] for c in comparisons), default=None)
+        savings = None
+        if best is not None and item.unit_price is not None:
+            savings = round((item.unit_price - best) * (item.quantity or 1), 2)
+        items.append({**_columns(item), "price_comparisons": comparisons, "best_price": best, "savings": savings})
+    return {
+        **_columns(quote),
+        "items": items,
+        "supplier": _columns(quote.supplier) if quote.supplier else None,
+    }
+
+
+def report_to_dict(report: Report) -> dict:
+    """Stessa forma del report restituito da ai_service"""
+    details = report.details or {}
+    return {
+        "id": report.id,
+        "quote_id": report.quote_id,
+        "report_type": report.report_type,
+        "created_at": report.created_at,
+        "title": report.title,
+        "summary": report.summary,
+        "analysis": report.content,
+        "recommendations": report.recommendations or [],
+        "risks": details.get("risks", []),
+        "conclusion": details.get("conclusion"),
+        "metrics": details.get("metrics", {}),
+        "total_savings": report.total_savings,
+        "file_path": report.file_path,
+    }
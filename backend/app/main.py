@@ -11,8 +11,13 @@ from contextlib import asynccontextmanager
 import logging
 
 from .core.config import settings
+from .db.database import init_db, close_db
 from .api.endpoints import quotes, search, reports, products, suppliers, settings as settings_endpoint
 from .services.scraper.scraper_service import scraper_service
+from .services.scraper.bulk_search import bulk_search_service
+from .services.tracking.history_store import price_history_store
+from .services.tracking.price_tracker import price_tracker
+from .services.ocr.ocr_service import ocr_service
 
 # Logging setup
 logging.basicConfig(
@@ -27,14 +32,47 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     logger.info("🚀 Starting PinkHouse API...")
     
-    # Initialize browser for scraping
-    await scraper_service.init_browser()
-    logger.info("✅ Scraper browser initialized")
+    try:
+        await init_db()
+        logger.info("✅ Database ready")
+    except Exception as e:
+        logger.error(f"❌ Database init failed: {e}")
+    
+    # Scraping: worker separati (browser fuori dal processo API) oppure in-process
+    if settings.SCRAPER_WORKERS > 0:
+        scraper_service.start_workers(settings.SCRAPER_WORKERS, settings.SCRAPER_WORKER_CONCURRENCY)
+        logger.info(f"✅ Scraper worker pool started ({settings.SCRAPER_WORKERS} workers)")
+    else:
+        # Chromium viene avviato al primo fetch che ne ha bisogno (fallback HTTP)
+        scraper_service.init_http_client()
+        logger.info("✅ Scraper HTTP client initialized (browser on first use)")
+    
+    try:
+        writer = price_history_store.open(settings.HISTORY_DIR)
+        logger.info(f"✅ Price history loaded ({'writer' if writer else 'read-only'})")
+    except OSError as e:
+        logger.error(f"❌ Price history load failed: {e}")
+    
+    try:
+        price_tracker.open(settings.TRACKING_WATCHLIST_FILE)
+        logger.info(f"✅ Watchlist loaded ({len(price_tracker.watchlist)} watched)")
+    except OSError as e:
+        logger.error(f"❌ Watchlist load failed: {e}")
+    
+    if settings.TRACKING_ENABLED:
+        price_tracker.start()
     
     yield
     
     # Cleanup
+    await price_tracker.stop()
+    if price_tracker.scheduling:
+        await price_tracker.save()
+    price_history_store.close()
+    await bulk_search_service.close()
     await scraper_service.close()
+    ocr_service.close()
+    await close_db()
     logger.info("👋 PinkHouse API shutdown complete")
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, JSON, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, JSON, Enum, Boolean, Index
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 import enum
@@ -49,12 +49,19 @@ class Quote(Base):
     raw_text = Column(Text)  # OCR output
     extracted_data = Column(JSON)  # Structured data from OCR
     ocr_confidence = Column(Float)
+    error = Column(Text)  # Errore OCR
     notes = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     supplier = relationship("Supplier", back_populates="quotes")
     items = relationship("QuoteItem", back_populates="quote", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Paginazione keyset (più recenti prima), anche filtrata per stato
+        Index("ix_quotes_created_at_id", "created_at", "id"),
+        Index("ix_quotes_status_created_at_id", "status", "created_at", "id"),
+    )
 
 
 class QuoteItem(Base):
@@ -62,7 +69,7 @@ class QuoteItem(Base):
     __tablename__ = "quote_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    quote_id = Column(Integer, ForeignKey("quotes.id"), nullable=False)
+    quote_id = Column(Integer, ForeignKey("quotes.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
     description = Column(Text, nullable=False)
     sku = Column(String(100))
@@ -105,7 +112,7 @@ class PriceComparison(Base):
     __tablename__ = "price_comparisons"
     
     id = Column(Integer, primary_key=True, index=True)
-    quote_item_id = Column(Integer, ForeignKey("quote_items.id"), nullable=False)
+    quote_item_id = Column(Integer, ForeignKey("quote_items.id"), nullable=False, index=True)
     source = Column(String(100), nullable=False)  # amazon, eprice, unieuro, etc
     source_url = Column(String(500))
     price = Column(Float, nullable=False)
@@ -145,6 +152,12 @@ class Report(Base):
     content = Column(Text)  # Markdown or HTML
     summary = Column(Text)
     recommendations = Column(JSON)
+    details = Column(JSON)  # risks, conclusion, metrics
     total_savings = Column(Float)
     file_path = Column(String(500))  # Generated PDF path
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_reports_created_at_id", "created_at", "id"),
+        Index("ix_reports_quote_id_created_at_id", "quote_id", "created_at", "id"),
+    )
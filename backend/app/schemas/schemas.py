@@ -131,6 +131,12 @@ class Quote(QuoteBase):
         from_attributes = True
 
 
+class QuotePage(BaseModel):
+    items: List[Quote]
+    next_cursor: Optional[str] = None  # None: ultima pagina
+    total: int  # da cache, può essere indietro di qualche secondo
+
+
 class QuoteDetail(Quote):
     items: List[QuoteItemWithComparisons] = []
     supplier: Optional[Supplier] = None
@@ -170,6 +176,7 @@ class OCRResult(BaseModel):
     supplier_info: Optional[dict] = None
     total_amount: Optional[float] = None
     quote_date: Optional[str] = None
+    pages: List[dict] = []  # per pagina: confidence, tempi (ms), righe con bbox e confidence
 
 
 # === SCRAPING ===
@@ -187,6 +194,18 @@ class ScrapeResult(BaseModel):
     scraped_at: datetime
     success: bool
     error: Optional[str] = None
+    cached: bool = False
+    timed_out: bool = False
+    stats: Optional[dict] = None  # tier di fetch, traffico, tempi
+
+
+# === PRICE TRACKING ===
+
+class WatchRequest(BaseModel):
+    query: Optional[str] = None
+    barcode: Optional[str] = None
+    sources: Optional[List[str]] = None
+    interval_minutes: Optional[int] = Field(default=None, ge=1)
 
 
 # === BARCODE ===
@@ -197,6 +216,10 @@ class BarcodeResult(BaseModel):
     product_info: Optional[ProductBase] = None
 
 
+class BarcodeBatchRequest(BaseModel):
+    barcodes: List[str]
+
+
 # === REPORT ===
 
 class ReportRequest(BaseModel):
@@ -144,7 +144,7 @@ Rispondi SOLO con JSON valido."""
             report_data = json.loads(result_text)
             
             return {
-                "title": f"Report Analisi Preventivo - {quote.supplier.name if quote.supplier else 'Preventivo'} - {datetime.now().strftime('%d/%m/%Y')}",
+                "title": f"Report Analisi Preventivo - {supplier_name if supplier_name != 'Non specificato' else 'Preventivo'} - {datetime.now().strftime('%d/%m/%Y')}",
                 "summary": report_data.get("summary", ""),
                 "analysis": report_data.get("analysis", ""),
                 "recommendations": report_data.get("recommendations", []),
@@ -0,0 +1,153 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lunghezza -> tipo per i codici con cifra di controllo
+CHECKSUM_TYPES = {8: "EAN-8", 12: "UPC-A", 13: "EAN-13", 14: "GTIN-14"}
+
+_MISSING = object()
+
+
+def checksum_valid(code: str) -> bool:
+    """Cifra di controllo GS1 (EAN-8, UPC-A, EAN-13, GTIN-14): pesi 3/1 da destra"""
+    digits = [int(c) for c in code]
+    body, check = digits[:-1], digits[-1]
+    total = sum(d * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10 == check
+
+
+def classify(code: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    (tipo, chiave normalizzata, errore)
+    - UPC-A viene normalizzato a EAN-13 (prefisso 0): stesso prodotto, stessa chiave
+    - altri codici (Code 128, codici interni anche solo numerici) passano senza verifica
+    """
+    code = code.strip()
+    if not code:
+        return "unknown", None, "Barcode vuoto"
+    if code.isdigit() and len(code) in CHECKSUM_TYPES:
+        barcode_type = CHECKSUM_TYPES[len(code)]
+        if not checksum_valid(code):
+            return barcode_type, None, "Cifra di controllo non valida"
+        return barcode_type, ("0" + code if len(code) == 12 else code), None
+    return "CODE128", code, None
+
+
+class BarcodeResolver:
+    """
+    Risoluzione barcode -> prodotto per sessioni di scansione
+    - Validazione della cifra di controllo prima di qualsiasi lookup
+    - LRU in memoria (anche per i "non trovato", invalidabile)
+    - I miss di un batch vengono risolti con un'unica ricerca; i miss già
+      in risoluzione per un'altra richiesta vengono attesi, non ripetuti
+    """
+
+    def __init__(self, max_entries: int, lookup_many: Callable[[List[str]], Awaitable[Dict[str, dict]]]):
+        self.max_entries = max(1, max_entries)
+        self.lookup_many = lookup_many
+        self._cache: "OrderedDict[str, Optional[dict]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalid = 0
+        self.batches = 0
+
+    def _get(self, key: str):
+        if key not in self._cache:
+            return _MISSING
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def _put(self, key: str, product: Optional[dict]):
+        self._cache[key] = product
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, code: str):
+        _, key, _ = classify(code)
+        if key:
+            self._cache.pop(key, None)
+
+    async def resolve_many(self, codes: List[str]) -> List[dict]:
+        """Un risultato per ogni codice in ingresso, nello stesso ordine"""
+        classified = [(code, *classify(code)) for code in codes]
+        resolved: Dict[str, Optional[dict]] = {}
+        cached: Dict[str, bool] = {}
+        to_fetch: List[str] = []
+        to_await: Dict[str, asyncio.Future] = {}
+
+        for _, _, key, error in classified:
+            if error:
+                self.invalid += 1
+                continue
+            if key in resolved or key in to_await or key in to_fetch:
+                continue
+            product = self._get(key)
+            if product is not _MISSING:
+                self.hits += 1
+                resolved[key] = product
+                cached[key] = True
+            elif key in self._pending:
+                to_await[key] = self._pending[key]
+            else:
+                self.misses += 1
+                to_fetch.append(key)
+
+        if to_fetch:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in to_fetch}
+            self._pending.update(futures)
+            self.batches += 1
+            try:
+                found = await self.lookup_many(to_fetch)
+                for key in to_fetch:
+                    product = found.get(key)
+                    self._put(key, product)
+                    resolved[key] = product
+                    futures[key].set_result(product)
+            except Exception as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                        future.exception()  # evita "exception was never retrieved" se nessuno attende
+                raise
+            finally:
+                for key in to_fetch:
+                    self._pending.pop(key, None)
+
+        for key, future in to_await.items():
+            resolved[key] = await future
+            cached[key] = False
+
+        results = []
+        for code, barcode_type, key, error in classified:
+            if error:
+                results.append({"barcode": code, "valid": False, "barcode_type": barcode_type, "found": False, "error": error})
+                continue
+            product = resolved.get(key)
+            results.append({
+                "barcode": code,
+                "valid": True,
+                "barcode_type": barcode_type,
+                "found": product is not None,
+                "product": product,
+                "cached": cached.get(key, False),
+            })
+        return results
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalid": self.invalid,
+            "batches": self.batches,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,259 @@
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import heapq
+import math
+import re
+import unicodedata
+
+# Peso dei campi nel punteggio
+FIELD_WEIGHTS = {
+    "barcode": 5.0,
+    "sku": 4.0,
+    "name": 3.0,
+    "brand": 2.0,
+    "category": 1.5,
+}
+# Campi indicizzati come codici (nessuno stemming/stopword)
+CODE_FIELDS = {"barcode", "sku"}
+FACET_FIELDS = {"category": "Altro", "brand": "Unknown"}
+
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+FUZZY_MATCH = 0.5
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+
+STOPWORDS = {
+    "a", "ad", "al", "alla", "alle", "allo", "agli", "ai", "con", "da", "dal", "dalla", "dei", "del",
+    "della", "delle", "dello", "degli", "di", "e", "ed", "gli", "i", "il", "in", "la", "le", "lo",
+    "nel", "nella", "per", "su", "sul", "sulla", "tra", "fra", "un", "una", "uno",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _fold(text: str) -> str:
+    """Minuscolo e senza accenti (perché -> perche)"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _stem(token: str) -> str:
+    """Stemming leggero per singolare/plurale e maschile/femminile (cavo/cavi -> cav)"""
+    if len(token) >= 4 and not token.isdigit() and token[-1] in "aeio":
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str, code: bool = False) -> List[str]:
+    """
+    Tokenizzazione per l'italiano
+    - le elisioni si separano sull'apostrofo ("l'adattatore" -> "adattatore")
+    - stopword rimosse, stemming leggero
+    - per i codici (SKU, barcode) solo minuscolo e split
+    """
+    if not text:
+        return []
+    tokens = _TOKEN_RE.findall(_fold(str(text)))
+    if code:
+        return tokens + ([''.join(tokens)] if len(tokens) > 1 else [])
+    return [_stem(t) for t in tokens if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def _fuzzy(term: str) -> bool:
+    """Tolleranza ai refusi solo per le parole: i codici devono matchare esattamente o per prefisso"""
+    return len(term) >= MIN_FUZZY_LENGTH and term.isalpha()
+
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+class ProductIndex:
+    """
+    Indice invertito in memoria sul catalogo prodotti
+    - Campi: nome, brand, categoria, SKU, barcode (pesati)
+    - Match esatto, per prefisso (ricerca mentre si digita) e con un errore
+      di battitura (indice delle cancellazioni, stile SymSpell)
+    - Ranking TF-IDF semplificato per campo; tutti i termini della query devono matchare
+    - Faccette categoria/brand mantenute in modo incrementale
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, dict] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._vocabulary: List[str] = []
+        self._deletes: Dict[str, Set[str]] = defaultdict(set)
+        self._facets: Dict[str, Dict[str, Set[str]]] = {field: defaultdict(set) for field in FACET_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # === INDICIZZAZIONE ===
+
+    def add(self, doc_id: str, product: dict, _bulk: bool = False):
+        """Indicizza (o reindicizza) un prodotto"""
+        if doc_id in self._docs:
+            self.remove(doc_id)
+
+        terms: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(product.get(field) or "", code=field in CODE_FIELDS):
+                terms[token] = max(terms.get(token, 0.0), weight)
+
+        self._docs[doc_id] = product
+        self._doc_terms[doc_id] = terms
+        for term, weight in terms.items():
+            if term not in self._postings:
+                self._add_term(term, sort=not _bulk)
+            self._postings[term][doc_id] = weight
+        for field, default in FACET_FIELDS.items():
+            self._facets[field][product.get(field) or default].add(doc_id)
+
+    def add_many(self, items: Iterable[Tuple[str, dict]]):
+        """Caricamento massivo: il vocabolario viene ordinato una volta sola"""
+        for doc_id, product in items:
+            self.add(doc_id, product, _bulk=True)
+        self._vocabulary.sort()
+
+    def remove(self, doc_id: str):
+        product = self._docs.pop(doc_id, None)
+        if product is None:
+            return
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                self._remove_term(term)
+        for field, default in FACET_FIELDS.items():
+            values = self._facets[field]
+            value = product.get(field) or default
+            values[value].discard(doc_id)
+            if not values[value]:
+                del values[value]
+
+    def _add_term(self, term: str, sort: bool = True):
+        if sort:
+            insort(self._vocabulary, term)
+        else:
+            self._vocabulary.append(term)
+        if _fuzzy(term):
+            for deleted in _deletes(term):
+                self._deletes[deleted].add(term)
+
+    def _remove_term(self, term: str):
+        del self._postings[term]
+        index = bisect_left(self._vocabulary, term)
+        if index < len(self._vocabulary) and self._vocabulary[index] == term:
+            del self._vocabulary[index]
+        if _fuzzy(term):
+            for deleted in _deletes(term):
+                self._deletes[deleted].discard(term)
+
+    # === RICERCA ===
+
+    def _expand(self, token: str, allow_prefix: bool) -> Dict[str, float]:
+        """Termini del vocabolario che matchano il token, con la qualità del match"""
+        matches: Dict[str, float] = {}
+        if token in self._postings:
+            matches[token] = EXACT_MATCH
+
+        if allow_prefix and len(token) >= MIN_PREFIX_LENGTH:
+            index = bisect_left(self._vocabulary, token)
+            while index < len(self._vocabulary) and self._vocabulary[index].startswith(token):
+                matches.setdefault(self._vocabulary[index], PREFIX_MATCH)
+                index += 1
+
+        if not matches and _fuzzy(token):
+            # distanza 1: cancellazione, inserimento, sostituzione
+            candidates = set(self._deletes.get(token, ()))
+            for deleted in _deletes(token):
+                if deleted in self._postings:
+                    candidates.add(deleted)
+                candidates |= self._deletes.get(deleted, set())
+            for term in candidates:
+                matches.setdefault(term, FUZZY_MATCH)
+        return matches
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self._docs) / len(self._postings[term]))
+
+    def search(
+        self,
+        query: str,
+        filters: Optional[Dict[str, str]] = None,
+        limit: int = 10,
+        offset: int = 0
+    ) -> dict:
+        """Risultati ordinati per rilevanza, totale e faccette (sui match prima dei filtri)"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        scores: Optional[Dict[str, float]] = None
+
+        # Query-codice (SKU/barcode digitato per intero, es. "LO-1234"): match esatto diretto
+        code = "".join(tokenize(query, code=True)[-1:]) if query.strip() and " " not in query.strip() else ""
+        if code and any(c.isdigit() for c in code) and code in self._postings:
+            tokens = []
+            scores = {doc_id: weight * EXACT_MATCH for doc_id, weight in self._postings[code].items()}
+
+        for position, token in enumerate(tokens):
+            # prefisso solo sull'ultimo termine (quello che si sta digitando) o sui token lunghi
+            allow_prefix = position == len(tokens) - 1 or len(token) >= MIN_FUZZY_LENGTH
+            token_scores: Dict[str, float] = {}
+            for term, quality in self._expand(token, allow_prefix).items():
+                idf = self._idf(term)
+                for doc_id, weight in self._postings[term].items():
+                    score = weight * quality * idf
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: scores[doc_id] + s for doc_id, s in token_scores.items() if doc_id in scores}
+            if not scores:
+                break
+
+        if scores is None:
+            # query vuota (o solo stopword): tutto il catalogo, filtrabile
+            scores = {doc_id: 0.0 for doc_id in self._docs}
+
+        facets = {
+            field: self._facet_counts(field, scores.keys())
+            for field in FACET_FIELDS
+        }
+
+        for field, value in (filters or {}).items():
+            if value and field in self._facets:
+                allowed = self._facets[field].get(value, set())
+                scores = {doc_id: s for doc_id, s in scores.items() if doc_id in allowed}
+
+        top = heapq.nsmallest(
+            offset + limit, scores.items(),
+            key=lambda pair: (-pair[1], self._docs[pair[0]].get("name", ""))
+        )
+        return {
+            "results": [self._docs[doc_id] for doc_id, _ in top[offset:]],
+            "total": len(scores),
+            "facets": facets,
+        }
+
+    def _facet_counts(self, field: str, doc_ids: Iterable[str]) -> Dict[str, int]:
+        default = FACET_FIELDS[field]
+        counts = Counter(self._docs[doc_id].get(field) or default for doc_id in doc_ids)
+        return dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+    def facet_values(self, field: str) -> List[str]:
+        """Valori distinti di una faccetta (es. categorie, brand)"""
+        return sorted(self._facets[field])
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self._docs),
+            "terms": len(self._vocabulary),
+            "fuzzy_keys": len(self._deletes),
+        }
+
+
+# Singleton instance
+product_index = ProductIndex()
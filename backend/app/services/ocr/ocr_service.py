@@ -1,16 +1,19 @@
-import pytesseract
 from PIL import Image
 import cv2
 import numpy as np
-from pdf2image import convert_from_path, convert_from_bytes
+from pdf2image import convert_from_path, pdfinfo_from_path
 import re
 import json
-from typing import List, Optional, Tuple
+from typing import AsyncIterator, List, Optional
 import asyncio
+import os
+import tempfile
 from anthropic import AsyncAnthropic
 import openai
 from ...core.config import settings
 from ...schemas.schemas import OCRResult, QuoteItemCreate
+from .page_pool import OCRPagePool
+from .pdf_text import ENGINE_NATIVE, extract_native_pages
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,33 +25,37 @@ class OCRService:
     1. Preprocessing immagine (OpenCV)
     2. Tesseract per estrazione base
     3. LLM per strutturazione e correzione
+    I passi 1-2 girano per pagina, in parallelo, su un pool di processi.
+    Le pagine PDF con uno strato di testo utilizzabile saltano 1-2: testo e
+    geometria vengono letti direttamente dal PDF (confidence 1.0).
     """
     
     def __init__(self):
-        pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
         self.anthropic = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY) if settings.ANTHROPIC_API_KEY else None
+        self.page_pool = OCRPagePool(settings.OCR_WORKERS, settings.OCR_ENGINE)
+        self.native_pages = 0
+        self.ocr_pages = 0
         
     async def process_document(self, file_bytes: bytes, filename: str) -> OCRResult:
         """Processa un documento (PDF o immagine) ed estrae i dati"""
         
-        # 1. Converti in immagini
-        images = await self._convert_to_images(file_bytes, filename)
-        
-        # 2. Preprocessing e OCR per ogni pagina
-        all_text = []
-        total_confidence = 0
+        # 1-2. Testo nativo dove possibile, OCR in pipeline per le altre pagine
+        if filename.lower().endswith('.pdf'):
+            pages = await self._process_pdf(file_bytes)
+        else:
+            pages = await self.page_pool.ocr_stream(self._iter_image(file_bytes))
         
-        for img in images:
-            processed = self._preprocess_image(img)
-            text, confidence = self._extract_text(processed)
-            all_text.append(text)
-            total_confidence += confidence
+        native = sum(1 for page in pages if page["engine"] == ENGINE_NATIVE)
+        self.native_pages += native
+        self.ocr_pages += len(pages) - native
         
-        raw_text = "\n\n--- PAGE BREAK ---\n\n".join(all_text)
-        avg_confidence = total_confidence / len(images) if images else 0
+        raw_text = "\n\n--- PAGE BREAK ---\n\n".join(page["text"] for page in pages)
+        avg_confidence = sum(page["confidence"] for page in pages) / len(pages) if pages else 0
         
-        # 3. LLM per strutturazione dati
-        if self.anthropic and avg_confidence < 0.95:
+        # 3. LLM per strutturazione dati. Le pagine native hanno confidence 1.0 fissa:
+        # se il testo è tutto nativo la soglia non dice nulla e si usa comunque l'LLM
+        all_native = bool(pages) and native == len(pages)
+        if self.anthropic and (all_native or avg_confidence < 0.95):
             extracted = await self._extract_with_llm(raw_text)
         else:
             extracted = self._extract_with_regex(raw_text)
@@ -59,78 +66,80 @@ class OCRService:
             extracted_items=extracted["items"],
             supplier_info=extracted.get("supplier"),
             total_amount=extracted.get("total"),
-            quote_date=extracted.get("date")
+            quote_date=extracted.get("date"),
+            pages=[self._page_summary(page) for page in pages]
         )
     
-    async def _convert_to_images(self, file_bytes: bytes, filename: str) -> List[np.ndarray]:
-        """Converte PDF o immagine in lista di immagini numpy"""
-        
-        if filename.lower().endswith('.pdf'):
-            # PDF to images
-            pil_images = convert_from_bytes(file_bytes, dpi=300)
-            return [np.array(img) for img in pil_images]
-        else:
-            # Single image
-            nparr = np.frombuffer(file_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            return [img] if img is not None else []
+    def _page_summary(self, page: dict) -> dict:
+        """Metadati pagina da salvare: righe con geometria e confidence, senza il dettaglio per parola"""
+        summary = {k: v for k, v in page.items() if k not in ("text", "lines")}
+        summary["lines"] = [{k: v for k, v in line.items() if k != "words"} for line in page["lines"]]
+        summary["low_confidence_words"] = sum(
+            1 for line in page["lines"] for word in line["words"]
+            if word["conf"] < settings.OCR_CONFIDENCE_THRESHOLD
+        )
+        return summary
     
-    def _preprocess_image(self, image: np.ndarray) -> np.ndarray:
+    async def _process_pdf(self, file_bytes: bytes) -> List[dict]:
         """
-        Preprocessing per migliorare OCR accuracy:
-        - Grayscale
-        - Denoising
-        - Binarization adattiva
-        - Deskew
+        Pagine di un PDF, nell'ordine
+        - strato di testo utilizzabile: estrazione diretta (millisecondi)
+        - scansioni: rasterizzazione e OCR, una pagina alla volta
         """
-        # Grayscale
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image
-        
-        # Denoise
-        denoised = cv2.fastNlMeansDenoising(gray, h=10)
-        
-        # Adaptive thresholding (binarization)
-        binary = cv2.adaptiveThreshold(
-            denoised, 255,
-            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY, 11, 2
-        )
-        
-        # Deskew
-        coords = np.column_stack(np.where(binary > 0))
-        if len(coords) > 0:
-            angle = cv2.minAreaRect(coords)[-1]
-            if angle < -45:
-                angle = 90 + angle
-            if abs(angle) > 0.5:
-                (h, w) = binary.shape[:2]
-                center = (w // 2, h // 2)
-                M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                binary = cv2.warpAffine(binary, M, (w, h),
-                    flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-        
-        return binary
+        # Il PDF viene scritto una volta sola: estrazione testo e rendering lo rileggono da disco
+        fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(file_bytes)
+            
+            pages = None
+            if settings.OCR_NATIVE_TEXT:
+                pages = await asyncio.to_thread(extract_native_pages, pdf_path, settings.OCR_PDF_DPI)
+            if pages is None:
+                info = await asyncio.to_thread(pdfinfo_from_path, pdf_path)
+                pages = [None] * int(info["Pages"])
+            
+            to_ocr = [number for number, page in enumerate(pages, start=1) if page is None]
+            if to_ocr:
+                scanned = await self.page_pool.ocr_stream(
+                    self._iter_pdf_pages(pdf_path, to_ocr),
+                    settings.OCR_MAX_PAGES_IN_FLIGHT
+                )
+                for number, page in zip(to_ocr, scanned):
+                    page["page"] = number
+                    pages[number - 1] = page
+            return pages
+        finally:
+            os.unlink(pdf_path)
     
-    def _extract_text(self, image: np.ndarray) -> Tuple[str, float]:
-        """Estrae testo con Tesseract e restituisce confidence"""
-        
-        # Config per italiano + layout tabellare
-        config = '--oem 3 --psm 6 -l ita+eng'
-        
-        # Estrai con dati dettagliati
-        data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
-        
-        # Calcola confidence media
-        confidences = [int(c) for c in data['conf'] if int(c) > 0]
-        avg_conf = sum(confidences) / len(confidences) / 100 if confidences else 0
-        
-        # Estrai testo
-        text = pytesseract.image_to_string(image, config=config)
-        
-        return text.strip(), avg_conf
+    async def _iter_pdf_pages(self, pdf_path: str, page_numbers: List[int]) -> AsyncIterator[np.ndarray]:
+        """
+        Pagine PDF come immagini numpy, una alla volta: una chiamata a pdftoppm
+        per pagina, direttamente in scala di grigi (1 byte/pixel); la memoria
+        non cresce con il numero di pagine
+        """
+        for page_number in page_numbers:
+            yield await asyncio.to_thread(self._render_page, pdf_path, page_number)
+    
+    async def _iter_image(self, file_bytes: bytes) -> AsyncIterator[np.ndarray]:
+        """Immagine singola: un'unica pagina"""
+        nparr = np.frombuffer(file_bytes, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if img is not None:
+            yield img
+    
+    def _render_page(self, pdf_path: str, page_number: int) -> np.ndarray:
+        page = convert_from_path(
+            pdf_path,
+            dpi=settings.OCR_PDF_DPI,
+            first_page=page_number,
+            last_page=page_number,
+            grayscale=True
+        )[0]
+        try:
+            return np.asarray(page)
+        finally:
+            page.close()
     
     async def _extract_with_llm(self, raw_text: str) -> dict:
         """Usa Claude per estrarre e strutturare i dati dal testo OCR"""
@@ -253,5 +262,16 @@ Se un campo non è presente, usa null. Correggi eventuali errori OCR evidenti.""
         }
 
 
+    def close(self):
+        self.page_pool.close()
+    
+    def stats(self) -> dict:
+        return {
+            "native_pages": self.native_pages,
+            "ocr_pages": self.ocr_pages,
+            "pages": self.page_pool.stats(),
+        }
+
+
 # Singleton instance
 ocr_service = OCRService()
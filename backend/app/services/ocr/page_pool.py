@@ -0,0 +1,326 @@
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterable, Dict, List, Optional, Tuple
+import time
+import logging
+import cv2
+import numpy as np
+import pytesseract
+from ...core.config import settings
+from .worker_env import init_ocr_worker
+
+# tesserocr viene importato solo nei worker, dopo aver limitato i thread OpenMP
+TESSEROCR_AVAILABLE = importlib.util.find_spec("tesserocr") is not None
+
+logger = logging.getLogger(__name__)
+
+# Italiano + layout tabellare
+TESSERACT_LANG = "ita+eng"
+TESSERACT_CONFIG = f'--oem 3 --psm 6 -l {TESSERACT_LANG}'
+TSV_COLUMNS = (
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text",
+)
+
+ENGINE_AUTO = "auto"
+ENGINE_TESSEROCR = "tesserocr"
+ENGINE_SUBPROCESS = "subprocess"
+
+# Motore Tesseract del processo worker (inizializzato una volta, modelli già caricati)
+_engine = None
+
+
+def _available_cores() -> int:
+    """Core effettivamente assegnati al processo (container/cgroup), non quelli della macchina"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _init_worker(tesseract_cmd: str, engine: str):
+    """
+    Inizializzazione del processo OCR: un core per processo, niente thread
+    interni di OpenCV/Tesseract che si contenderebbero i core tra le pagine.
+    Con tesserocr il motore resta caricato per tutta la vita del worker.
+    """
+    global _engine
+    cv2.setNumThreads(1)  # OMP_THREAD_LIMIT è già impostato da worker_env.init_ocr_worker
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    if engine == ENGINE_SUBPROCESS:
+        return
+    try:
+        # import qui e non a livello di modulo: libgomp legge OMP_THREAD_LIMIT quando viene caricata
+        import tesserocr
+    except ImportError:  # libtesseract non disponibile: solo subprocess
+        if engine == ENGINE_TESSEROCR:
+            logger.warning("tesserocr not installed, using tesseract subprocess")
+        return
+    try:
+        _engine = tesserocr.PyTessBaseAPI(lang=TESSERACT_LANG, psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.DEFAULT)
+    except RuntimeError as e:
+        logger.warning(f"tesserocr init failed, using tesseract subprocess: {e}")
+
+
+def preprocess_image(image: np.ndarray) -> np.ndarray:
+    """
+    Preprocessing per migliorare OCR accuracy:
+    - Grayscale
+    - Denoising
+    - Binarization adattiva
+    - Deskew
+    """
+    # Grayscale
+    if len(image.shape) == 3:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image
+
+    # Denoise
+    denoised = cv2.fastNlMeansDenoising(gray, h=10)
+
+    # Adaptive thresholding (binarization)
+    binary = cv2.adaptiveThreshold(
+        denoised, 255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, 11, 2
+    )
+
+    # Deskew
+    coords = np.column_stack(np.where(binary > 0))
+    if len(coords) > 0:
+        angle = cv2.minAreaRect(coords)[-1]
+        if angle < -45:
+            angle = 90 + angle
+        if abs(angle) > 0.5:
+            (h, w) = binary.shape[:2]
+            center = (w // 2, h // 2)
+            M = cv2.getRotationMatrix2D(center, angle, 1.0)
+            binary = cv2.warpAffine(binary, M, (w, h),
+                flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+    return binary
+
+
+def _bbox(data: dict, i: int) -> List[int]:
+    return [data["left"][i], data["top"][i], data["width"][i], data["height"][i]]
+
+
+def _join_words(words: List[dict]) -> str:
+    """
+    Riga di testo dalle parole: gli spazi larghi (colonne di una tabella)
+    diventano più spazi, in proporzione alla larghezza media dei caratteri
+    """
+    char_width = sum(w["bbox"][2] for w in words) / max(1, sum(len(w["text"]) for w in words))
+    parts = [words[0]["text"]]
+    for previous, word in zip(words, words[1:]):
+        gap = word["bbox"][0] - (previous["bbox"][0] + previous["bbox"][2])
+        parts.append(" " * max(1, round(gap / char_width)) if char_width else " ")
+        parts.append(word["text"])
+    return "".join(parts)
+
+
+def _data_from_engine(image: np.ndarray) -> dict:
+    """Riconoscimento in-process: buffer numpy passato direttamente, nessun file temporaneo"""
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    _engine.SetImageBytes(image.tobytes(), width, height, channels, image.strides[0])
+    if not _engine.Recognize():
+        raise RuntimeError("Tesseract recognition failed")
+    data = {column: [] for column in TSV_COLUMNS}
+    for row in _engine.GetTSVText(0).splitlines():
+        values = row.split("\t")
+        if len(values) < len(TSV_COLUMNS):
+            values += [""] * (len(TSV_COLUMNS) - len(values))
+        for column, value in zip(TSV_COLUMNS, values):
+            data[column].append(value if column == "text" else (float(value) if column == "conf" else int(value)))
+    _engine.Clear()
+    return data
+
+
+def layout_lines(lines: Dict[Tuple[int, int, int], List[dict]]) -> Tuple[str, float, List[dict]]:
+    """
+    Testo della pagina da parole raggruppate per (blocco, paragrafo, riga):
+    riga vuota tra paragrafi, spaziatura delle colonne preservata.
+    Restituisce (testo, confidence media, righe con bbox, confidence e parole).
+    """
+    text_lines: List[str] = []
+    result: List[dict] = []
+    previous_paragraph = None
+    for (block, paragraph, _), words in lines.items():
+        if previous_paragraph is not None and (block, paragraph) != previous_paragraph:
+            text_lines.append("")  # riga vuota tra paragrafi, come image_to_string
+        previous_paragraph = (block, paragraph)
+        line_text = _join_words(words)
+        text_lines.append(line_text)
+        left = min(w["bbox"][0] for w in words)
+        top = min(w["bbox"][1] for w in words)
+        right = max(w["bbox"][0] + w["bbox"][2] for w in words)
+        bottom = max(w["bbox"][1] + w["bbox"][3] for w in words)
+        result.append({
+            "text": line_text,
+            "confidence": round(sum(w["conf"] for w in words) / len(words), 3),
+            "bbox": [left, top, right - left, bottom - top],
+            "words": words,
+        })
+
+    confidences = [w["conf"] for words in lines.values() for w in words]
+    avg_conf = sum(confidences) / len(confidences) if confidences else 0
+    return "\n".join(text_lines).strip(), avg_conf, result
+
+
+def _tesseract_data(image: np.ndarray) -> Tuple[dict, str]:
+    """Dati per parola in formato image_to_data, e motore usato"""
+    if _engine is not None:
+        try:
+            return _data_from_engine(image), ENGINE_TESSEROCR
+        except RuntimeError as e:
+            logger.warning(f"tesserocr failed on page, retrying with subprocess: {e}")
+    data = pytesseract.image_to_data(image, config=TESSERACT_CONFIG, output_type=pytesseract.Output.DICT)
+    return data, ENGINE_SUBPROCESS
+
+
+def extract_text(image: np.ndarray) -> Tuple[str, float, List[dict], str]:
+    """
+    Un solo passaggio di Tesseract: testo ricostruito dalle parole,
+    confidence di pagina, righe con geometria e confidence per riga e per parola,
+    motore usato (tesserocr in-process o subprocess)
+    """
+    data, engine = _tesseract_data(image)
+
+    # Parole raggruppate per riga, nell'ordine di lettura di Tesseract
+    lines: Dict[Tuple[int, int, int], List[dict]] = {}
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not str(word).strip():
+            continue  # livelli pagina/blocco/paragrafo/riga hanno conf -1
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append({"text": str(word).strip(), "conf": round(conf / 100, 3), "bbox": _bbox(data, i)})
+
+    text, avg_conf, result = layout_lines(lines)
+    return text, avg_conf, result, engine
+
+
+def ocr_page(index: int, image: np.ndarray) -> dict:
+    """Preprocessing + OCR di una pagina, con i tempi delle due fasi"""
+    start = time.perf_counter()
+    processed = preprocess_image(image)
+    preprocessed = time.perf_counter()
+    text, confidence, lines, engine = extract_text(processed)
+    done = time.perf_counter()
+    return {
+        "page": index + 1,
+        "engine": engine,
+        "text": text,
+        "confidence": confidence,
+        "lines": lines,
+        "preprocess_ms": round((preprocessed - start) * 1000, 1),
+        "ocr_ms": round((done - preprocessed) * 1000, 1),
+    }
+
+
+class OCRPagePool:
+    """
+    OCR delle pagine in parallelo su un pool di processi
+    - Una pagina per task: preprocessing e Tesseract girano fuori dall'event loop
+      e su tutti i core disponibili
+    - Risultati riassemblati nell'ordine delle pagine
+    - Tempi per pagina (preprocessing, OCR, attesa in coda)
+    - Motore: tesserocr in-process (un'istanza calda per worker) se disponibile,
+      altrimenti il binario tesseract via pytesseract
+    """
+
+    def __init__(self, workers: int, engine: str = ENGINE_AUTO):
+        if engine not in (ENGINE_AUTO, ENGINE_TESSEROCR, ENGINE_SUBPROCESS):
+            logger.warning(f"Unknown OCR engine '{engine}', using '{ENGINE_AUTO}'")
+            engine = ENGINE_AUTO
+        self.workers = max(1, workers or _available_cores())
+        self.engine = engine
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.documents = 0
+        self.pages = 0
+        self.pages_by_engine: Dict[str, int] = {}
+        self.total_time = 0.0
+        self.max_page_time = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_ocr_worker,
+                initargs=(settings.TESSERACT_CMD, self.engine)
+            )
+        return self._executor
+
+    async def ocr_stream(self, images: AsyncIterable[np.ndarray], max_in_flight: int = 0) -> List[dict]:
+        """
+        OCR di pagine prodotte una alla volta (es. rasterizzazione PDF), in pipeline:
+        la pagina successiva viene prodotta mentre le precedenti sono in OCR.
+        Al più max_in_flight pagine (0 = 2 per worker) sono in memoria insieme,
+        qualunque sia la lunghezza del documento.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        slots = asyncio.Semaphore(max(1, max_in_flight or 2 * self.workers))
+        start = time.perf_counter()
+
+        async def run(index: int, image: np.ndarray) -> dict:
+            try:
+                submitted = time.perf_counter()
+                page = await loop.run_in_executor(executor, ocr_page, index, image)
+                page["wall_ms"] = round((time.perf_counter() - submitted) * 1000, 1)
+                return page
+            finally:
+                slots.release()
+
+        tasks: List[asyncio.Task] = []
+        iterator = images.__aiter__()
+        try:
+            while True:
+                await slots.acquire()  # nessuna nuova pagina finché non si libera un posto
+                try:
+                    image = await iterator.__anext__()
+                except StopAsyncIteration:
+                    slots.release()
+                    break
+                tasks.append(asyncio.create_task(run(len(tasks), image)))
+                del image
+            pages = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose:
+                await aclose()
+
+        self.documents += 1
+        self.pages += len(pages)
+        self.total_time += time.perf_counter() - start
+        for page in pages:
+            self.pages_by_engine[page["engine"]] = self.pages_by_engine.get(page["engine"], 0) + 1
+            self.max_page_time = max(self.max_page_time, (page["preprocess_ms"] + page["ocr_ms"]) / 1000)
+        return list(pages)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "engine": self.engine,
+            "tesserocr_available": TESSEROCR_AVAILABLE,
+            "pages_by_engine": self.pages_by_engine,
+            "documents": self.documents,
+            "pages": self.pages,
+            "avg_document_ms": round(self.total_time / self.documents * 1000, 1) if self.documents else 0,
+            "max_page_ms": round(self.max_page_time * 1000, 1),
+        }
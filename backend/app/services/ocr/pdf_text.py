@@ -0,0 +1,95 @@
+import subprocess
+from typing import Dict, List, Optional, Tuple
+import time
+import logging
+from lxml import etree
+from ...core.config import settings
+from .page_pool import layout_lines
+
+logger = logging.getLogger(__name__)
+
+ENGINE_NATIVE = "native"
+POINTS_PER_INCH = 72
+
+
+def _local(element) -> str:
+    return etree.QName(element).localname
+
+
+def _usable(words: List[dict]) -> bool:
+    """
+    Strato di testo utilizzabile: abbastanza parole e caratteri leggibili
+    (font senza mappatura Unicode producono caratteri di sostituzione o di controllo)
+    """
+    if len(words) < settings.OCR_NATIVE_MIN_WORDS:
+        return False
+    chars = "".join(w["text"] for w in words)
+    readable = sum(1 for c in chars if c.isprintable() and c != "\ufffd")
+    return readable / len(chars) >= settings.OCR_NATIVE_MIN_READABLE
+
+
+def _page_lines(page, scale: float) -> Dict[Tuple[int, int, int], List[dict]]:
+    """Parole per (flow, blocco, riga), bbox in pixel alla stessa risoluzione dell'OCR"""
+    lines: Dict[Tuple[int, int, int], List[dict]] = {}
+    flows = [e for e in page if _local(e) == "flow"]
+    for f, flow in enumerate(flows):
+        for b, block in enumerate(e for e in flow if _local(e) == "block"):
+            for l, line in enumerate(e for e in block if _local(e) == "line"):
+                for word in line:
+                    text = (word.text or "").strip()
+                    if _local(word) != "word" or not text:
+                        continue
+                    x_min, y_min = float(word.get("xMin")) * scale, float(word.get("yMin")) * scale
+                    x_max, y_max = float(word.get("xMax")) * scale, float(word.get("yMax")) * scale
+                    lines.setdefault((f, b, l), []).append({
+                        "text": text,
+                        "conf": 1.0,
+                        "bbox": [round(x_min), round(y_min), round(x_max - x_min), round(y_max - y_min)],
+                    })
+    return lines
+
+
+def extract_native_pages(pdf_path: str, dpi: int) -> Optional[List[Optional[dict]]]:
+    """
+    Testo e geometria dallo strato di testo del PDF (pdftotext -bbox-layout), senza OCR.
+    Una voce per pagina: dict nello stesso formato delle pagine OCR, oppure None
+    se la pagina va passata all'OCR (scansione, testo assente o illeggibile).
+    None se il PDF non è leggibile da pdftotext.
+    """
+    start = time.perf_counter()
+    try:
+        output = subprocess.run(
+            ["pdftotext", "-bbox-layout", "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True,
+            timeout=settings.OCR_NATIVE_TIMEOUT,
+            check=True
+        ).stdout
+        root = etree.fromstring(output, parser=etree.XMLParser(recover=True, huge_tree=True))
+    except (OSError, subprocess.SubprocessError, etree.XMLSyntaxError) as e:
+        logger.warning(f"Native PDF text extraction failed, using OCR: {e}")
+        return None
+    if root is None:
+        return None
+
+    scale = dpi / POINTS_PER_INCH
+    pages = [e for e in root.iter() if isinstance(e.tag, str) and _local(e) == "page"]
+    elapsed_ms = round((time.perf_counter() - start) * 1000 / max(1, len(pages)), 1)
+
+    result: List[Optional[dict]] = []
+    for index, page in enumerate(pages):
+        lines = _page_lines(page, scale)
+        words = [w for line in lines.values() for w in line]
+        if not _usable(words):
+            result.append(None)
+            continue
+        text, _, page_lines = layout_lines(lines)
+        result.append({
+            "page": index + 1,
+            "engine": ENGINE_NATIVE,
+            "text": text,
+            "confidence": 1.0,
+            "lines": page_lines,
+            "preprocess_ms": 0.0,
+            "ocr_ms": elapsed_ms,
+        })
+    return result
@@ -0,0 +1,13 @@
+"""
+Initializer dei processi OCR, in un modulo senza dipendenze pesanti: il processo
+spawn lo importa prima di page_pool, quindi OMP_THREAD_LIMIT è già impostato
+quando cv2 e tesserocr caricano libgomp. L'ambiente del processo API non cambia.
+"""
+
+import os
+
+
+def init_ocr_worker(tesseract_cmd: str, engine: str):
+    os.environ["OMP_THREAD_LIMIT"] = "1"  # letto da libgomp al caricamento e dal sottoprocesso tesseract
+    from .page_pool import _init_worker
+    _init_worker(tesseract_cmd, engine)
@@ -0,0 +1,233 @@
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import inspect
+import json
+import time
+import uuid
+import logging
+import redis.asyncio as aioredis
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+from ...core.config import settings
+from .result_cache import REDIS_RETRY_AFTER, normalize_query
+from .scraper_service import scraper_service
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 200
+# Campi scalari del job salvati nell'hash Redis (i risultati stanno in una lista a parte)
+JOB_FIELDS = ("id", "quote_id", "status", "total", "completed", "error", "created_at", "finished_at")
+
+
+def _item_key(item: dict) -> Tuple[str, Optional[str]]:
+    return normalize_query(item.get("description", "")), item.get("barcode") or None
+
+
+class BulkSearchService:
+    """
+    Ricerca prezzi per molti item (es. tutte le righe di un preventivo)
+    - Deduplica gli item identici (stessa descrizione/barcode)
+    - Esegue le ricerche in parallelo sotto un budget globale;
+      il budget per fonte è quello del governatore dello scraper
+    - Restituisce i risultati per item man mano che sono pronti
+    - Job in background con stato interrogabile da qualsiasi worker uvicorn:
+      stato e risultati in Redis con TTL; il worker che esegue il job tiene
+      anche una copia locale (unica fonte se Redis non è raggiungibile)
+    """
+
+    def __init__(self, concurrency: int, redis_url: Optional[str] = None, job_ttl: int = 24 * 3600):
+        self.concurrency = max(1, concurrency)
+        self.redis_url = redis_url
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._redis: Optional[aioredis.Redis] = None
+        self._redis_down_until = 0.0
+        self.redis_errors = 0
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"pinkhouse:job:{job_id}"
+
+    def _redis_client(self) -> Optional[aioredis.Redis]:
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.redis_url, socket_timeout=1, socket_connect_timeout=1)
+        return self._redis
+
+    def _redis_failed(self, e: Exception):
+        self.redis_errors += 1
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+        logger.warning(f"Redis unavailable, bulk search jobs visible only on this worker: {e}")
+
+    async def _store(self, job: dict, result: Optional[dict] = None):
+        """Salva i campi del job (e un nuovo risultato) in Redis, rinnovando il TTL"""
+        client = self._redis_client()
+        if client is None:
+            return
+        key = self._job_key(job["id"])
+        fields = {name: json.dumps(jsonable_encoder(job[name])) for name in JOB_FIELDS}
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=fields)
+                pipe.expire(key, self.job_ttl)
+                if result is not None:
+                    pipe.rpush(f"{key}:results", json.dumps(jsonable_encoder(result)))
+                    pipe.expire(f"{key}:results", self.job_ttl)
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+
+    async def _load(self, job_id: str) -> Optional[dict]:
+        client = self._redis_client()
+        if client is None:
+            return None
+        key = self._job_key(job_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hgetall(key)
+                pipe.lrange(f"{key}:results", 0, -1)
+                fields, results = await pipe.execute()
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+            return None
+        if not fields:
+            return None
+        job = {name.decode(): json.loads(value) for name, value in fields.items()}
+        job["results"] = sorted((json.loads(r) for r in results), key=lambda r: r["item_index"])
+        return job
+
+    async def iter_search(
+        self,
+        items: List[dict],
+        sources: Optional[List[str]] = None
+    ) -> AsyncIterator[dict]:
+        """Genera un risultato per ogni item cercabile, in ordine di completamento"""
+        groups: Dict[Tuple[str, Optional[str]], List[int]] = {}
+        for i, item in enumerate(items):
+            if item.get("description") or item.get("barcode"):
+                groups.setdefault(_item_key(item), []).append(i)
+
+        if not groups:
+            return
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(indexes: List[int]):
+            item = items[indexes[0]]
+            async with semaphore:
+                results = await scraper_service.search_all_sources(
+                    query=item.get("description", ""),
+                    barcode=item.get("barcode"),
+                    sources=sources
+                )
+            return indexes, results
+
+        tasks = [asyncio.create_task(run(indexes)) for indexes in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indexes, results = await next_done
+                for i in indexes:
+                    yield {
+                        "item_index": i,
+                        "item_description": items[i].get("description", ""),
+                        "results": results
+                    }
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def search(self, items: List[dict], sources: Optional[List[str]] = None) -> List[dict]:
+        """Come iter_search, ma attende tutti gli item e li ordina per indice"""
+        results = [r async for r in self.iter_search(items, sources)]
+        return sorted(results, key=lambda r: r["item_index"])
+
+    async def start_job(
+        self,
+        items: List[dict],
+        sources: Optional[List[str]] = None,
+        quote_id: Optional[int] = None,
+        on_complete: Optional[Callable[[List[dict]], Any]] = None
+    ) -> dict:
+        """Avvia una ricerca bulk in background e restituisce il job"""
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "quote_id": quote_id,
+            "status": "running",
+            "total": sum(1 for item in items if item.get("description") or item.get("barcode")),
+            "completed": 0,
+            "results": [],
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "finished_at": None
+        }
+        self.jobs[job_id] = job
+        await self._store(job)
+        self._tasks[job_id] = asyncio.create_task(self._run_job(job, items, sources, on_complete))
+        self._prune()
+        return job
+
+    async def _run_job(
+        self,
+        job: dict,
+        items: List[dict],
+        sources: Optional[List[str]],
+        on_complete: Optional[Callable[[List[dict]], Any]]
+    ):
+        try:
+            async for result in self.iter_search(items, sources):
+                job["results"].append(result)
+                job["completed"] += 1
+                await self._store(job, result)
+            job["results"].sort(key=lambda r: r["item_index"])
+            if on_complete:
+                outcome = on_complete(job["results"])
+                if inspect.isawaitable(outcome):
+                    await outcome
+            job["status"] = "completed"
+        except asyncio.CancelledError:
+            job["status"] = "error"
+            job["error"] = "Job interrotto (arresto del worker)"
+            raise
+        except Exception as e:
+            logger.error(f"Bulk search job {job['id']} failed: {e}")
+            job["status"] = "error"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = datetime.utcnow()
+            self._tasks.pop(job["id"], None)
+            await self._store(job)
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        """Job locale se eseguito da questo worker, altrimenti da Redis"""
+        return self.jobs.get(job_id) or await self._load(job_id)
+
+    async def close(self):
+        """Interrompe i job in corso (segnati come falliti) e chiude Redis"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in self.jobs.values():
+            if job["status"] == "running":  # task annullato prima di partire
+                job.update(status="error", error="Job interrotto (arresto del worker)", finished_at=datetime.utcnow())
+                await self._store(job)
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j["status"] != "running"]
+        for job in sorted(finished, key=lambda j: j["created_at"])[:-MAX_FINISHED_JOBS or None]:
+            del self.jobs[job["id"]]
+
+
+# Singleton instance
+bulk_search_service = BulkSearchService(
+    concurrency=settings.SCRAPE_BULK_CONCURRENCY,
+    redis_url=settings.REDIS_URL,
+    job_ttl=settings.SCRAPE_JOB_TTL
+)
@@ -0,0 +1,206 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import time
+import logging
+from playwright.async_api import Browser, BrowserContext, Page
+from .interception import ContextInterceptor, InterceptionPolicy, PageBudget
+
+logger = logging.getLogger(__name__)
+
+
+CONTEXT_OPTIONS = {
+    "viewport": {'width': 1920, 'height': 1080},
+    "user_agent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    "locale": 'it-IT',
+}
+
+
+@dataclass
+class PooledContext:
+    """Context Playwright riutilizzabile, legato a una singola fonte"""
+    source: str
+    context: BrowserContext
+    interceptor: ContextInterceptor
+    created_at: float = field(default_factory=time.monotonic)
+    uses: int = 0
+    healthy: bool = True
+
+
+@dataclass
+class _SourcePool:
+    semaphore: asyncio.Semaphore
+    idle: List[PooledContext] = field(default_factory=list)
+    alive: int = 0
+    in_use: int = 0
+    waiting: int = 0
+    acquired: int = 0
+    created: int = 0
+    reused: int = 0
+    recycled: int = 0
+    discarded: int = 0
+
+
+class BrowserContextPool:
+    """
+    Pool limitato di browser context per fonte
+    - Context pre-riscaldati all'avvio
+    - Riciclo dopo N utilizzi o se non più sani
+    - Statistiche su dimensione, coda e riutilizzi
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_uses: int,
+        warm: int = 0,
+        policy_for: Optional[Callable[[str], InterceptionPolicy]] = None
+    ):
+        self.max_size = max(1, max_size)
+        self.max_uses = max(1, max_uses)
+        self.warm = min(warm, self.max_size)
+        self.policy_for = policy_for or (lambda source: InterceptionPolicy())
+        self.browser: Optional[Browser] = None
+        self._pools: Dict[str, _SourcePool] = {}
+
+    def _pool(self, source: str) -> _SourcePool:
+        pool = self._pools.get(source)
+        if pool is None:
+            pool = _SourcePool(semaphore=asyncio.Semaphore(self.max_size))
+            self._pools[source] = pool
+        return pool
+
+    async def start(self, browser: Browser, sources: List[str]):
+        """Collega il browser e pre-crea i context per le fonti indicate"""
+        self.browser = browser
+        for source in sources:
+            pool = self._pool(source)
+            while pool.alive < self.warm:
+                pool.idle.append(await self._create(source, pool))
+
+    async def _create(self, source: str, pool: _SourcePool) -> PooledContext:
+        context = await self.browser.new_context(**CONTEXT_OPTIONS)
+        # Intercettazione richieste secondo la politica della fonte (una sola volta per context)
+        interceptor = ContextInterceptor(self.policy_for(source))
+        await interceptor.install(context)
+        pool.alive += 1
+        pool.created += 1
+        pooled = PooledContext(source=source, context=context, interceptor=interceptor)
+        context.on("close", lambda _: setattr(pooled, "healthy", False))
+        return pooled
+
+    async def _dispose(self, pooled: PooledContext, pool: _SourcePool):
+        pool.alive -= 1
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.debug(f"Error closing context for {pooled.source}: {e}")
+
+    def _is_healthy(self, pooled: PooledContext) -> bool:
+        return (
+            pooled.healthy
+            and self.browser is not None
+            and self.browser.is_connected()
+        )
+
+    async def _acquire(self, source: str) -> PooledContext:
+        pool = self._pool(source)
+        pool.waiting += 1
+        try:
+            await pool.semaphore.acquire()
+        finally:
+            pool.waiting -= 1
+
+        try:
+            while pool.idle:
+                pooled = pool.idle.pop()
+                if self._is_healthy(pooled):
+                    break
+                pool.discarded += 1
+                await self._dispose(pooled, pool)
+            else:
+                pooled = await self._create(source, pool)
+        except BaseException:
+            pool.semaphore.release()
+            raise
+
+        pooled.uses += 1
+        if pooled.uses > 1:
+            pool.reused += 1
+        pool.in_use += 1
+        pool.acquired += 1
+        return pooled
+
+    async def _release(self, pooled: PooledContext):
+        pool = self._pool(pooled.source)
+        pool.in_use -= 1
+        try:
+            if not self._is_healthy(pooled):
+                pool.discarded += 1
+                await self._dispose(pooled, pool)
+            elif pooled.uses >= self.max_uses:
+                pool.recycled += 1
+                await self._dispose(pooled, pool)
+            else:
+                pool.idle.append(pooled)
+        finally:
+            pool.semaphore.release()
+
+    @asynccontextmanager
+    async def page(self, source: str) -> AsyncIterator[Tuple[Page, PageBudget]]:
+        """
+        Pagina nuova su un context del pool, con i contatori di traffico
+        della pagina; il context torna nel pool all'uscita
+        """
+        if self.browser is None:
+            raise RuntimeError("Context pool non inizializzato")
+
+        pooled = await self._acquire(source)
+        try:
+            page = await pooled.context.new_page()
+            budget = await pooled.interceptor.start_page(page)
+        except Exception:
+            pooled.healthy = False
+            await self._release(pooled)
+            raise
+
+        try:
+            yield page, budget
+        finally:
+            pooled.interceptor.finish_page()
+            try:
+                await page.close()
+            except Exception as e:
+                logger.debug(f"Error closing page for {source}: {e}")
+                pooled.healthy = False
+            await self._release(pooled)
+
+    async def close(self):
+        """Chiude tutti i context inattivi"""
+        for pool in self._pools.values():
+            while pool.idle:
+                await self._dispose(pool.idle.pop(), pool)
+        self._pools.clear()
+        self.browser = None
+
+    def stats(self) -> dict:
+        """Dimensione pool, coda di attesa e riutilizzi per fonte"""
+        return {
+            "max_size": self.max_size,
+            "max_uses": self.max_uses,
+            "sources": {
+                source: {
+                    "size": pool.alive,
+                    "idle": len(pool.idle),
+                    "in_use": pool.in_use,
+                    "waiting": pool.waiting,
+                    "acquired": pool.acquired,
+                    "created": pool.created,
+                    "reused": pool.reused,
+                    "recycled": pool.recycled,
+                    "discarded": pool.discarded,
+                }
+                for source, pool in self._pools.items()
+            }
+        }
@@ -0,0 +1,216 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Pattern, Tuple
+import re
+import time
+import logging
+from playwright.async_api import BrowserContext, Error as PlaywrightError, Page, Request, Route
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKED_TYPES = frozenset({"image", "font", "media", "stylesheet", "manifest", "texttrack", "eventsource", "websocket"})
+
+# Estensioni per tipo di risorsa: bloccate dal browser stesso (CDP), senza passare da Python
+BLOCKED_EXTENSIONS = {
+    "image": ("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "bmp"),
+    "font": ("woff", "woff2", "ttf", "otf", "eot"),
+    "media": ("mp4", "webm", "mp3", "m4a", "ogg", "m3u8"),
+    "stylesheet": ("css",),
+    "manifest": ("webmanifest",),
+    "texttrack": ("vtt",),
+}
+
+# Ads, analytics e tracker noti: bloccati nativamente prima del filtro first-party
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "googleadservices.com", "facebook.net", "connect.facebook.com", "hotjar.com", "clarity.ms",
+    "criteo.com", "criteo.net", "scorecardresearch.com", "taboola.com", "outbrain.com",
+    "adnxs.com", "amazon-adsystem.com", "bat.bing.com", "analytics.tiktok.com",
+)
+
+# Errore con cui il browser segnala le richieste bloccate (nativamente o da route.abort)
+BLOCKED_ERROR = "net::ERR_BLOCKED_BY_CLIENT"
+
+# Dimensione media stimata per tipo di risorsa bloccata (byte)
+ESTIMATED_SIZES = {
+    "image": 40_000,
+    "font": 35_000,
+    "media": 250_000,
+    "stylesheet": 30_000,
+    "script": 45_000,
+    "xhr": 8_000,
+    "fetch": 8_000,
+}
+ESTIMATED_SIZE_DEFAULT = 5_000
+
+
+@dataclass(frozen=True)
+class InterceptionPolicy:
+    """
+    Politica di intercettazione richieste per una fonte
+    - `first_party_hosts`: domini ammessi (sottodomini inclusi); tutto il resto
+      (ads, analytics, tracker, XHR di terze parti) viene bloccato
+    - `blocked_types`: tipi di risorsa bloccati anche se first-party (per estensione)
+    - `byte_budget`: oltre questa soglia passano solo i documenti
+    - `time_budget`: secondi dall'apertura della pagina oltre i quali passano solo i documenti
+    """
+    first_party_hosts: Tuple[str, ...] = ()
+    blocked_types: FrozenSet[str] = DEFAULT_BLOCKED_TYPES
+    byte_budget: int = 3 * 1024 * 1024
+    time_budget: float = 15.0
+
+    def native_block_patterns(self) -> List[str]:
+        """Pattern per Network.setBlockedURLs: estensioni dei tipi bloccati e tracker noti"""
+        patterns = []
+        for resource_type in sorted(self.blocked_types):
+            for extension in BLOCKED_EXTENSIONS.get(resource_type, ()):
+                patterns += [f"*.{extension}", f"*.{extension}?*"]
+        for host in TRACKER_HOSTS:
+            patterns += [f"*://{host}/*", f"*://*.{host}/*"]
+        return patterns
+
+    def third_party_pattern(self) -> Optional[Pattern]:
+        """
+        URL fuori dai domini ammessi. Una regex (non un predicato) viene valutata
+        dal browser: solo le richieste di terze parti arrivano al callback Python.
+        Sintassi compatibile con le regex JavaScript.
+        """
+        if not self.first_party_hosts:
+            return None
+        hosts = "|".join(h.replace(".", r"\.") for h in self.first_party_hosts)
+        return re.compile(rf"^(?!https?://([^/?#]*\.)?({hosts})(:\d+)?([/?#]|$))(?!data:|blob:)", re.IGNORECASE)
+
+
+@dataclass
+class PageBudget:
+    """Contatori di traffico per una singola pagina/scrape"""
+    bytes_loaded: int = 0
+    bytes_saved_estimate: int = 0
+    allowed_requests: int = 0
+    blocked_requests: int = 0
+    blocked_by_type: Dict[str, int] = field(default_factory=dict)
+    over_budget: bool = False
+    over_time: bool = False
+    started_at: float = field(default_factory=time.monotonic)
+
+    def block(self, resource_type: str):
+        self.blocked_requests += 1
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        self.bytes_saved_estimate += ESTIMATED_SIZES.get(resource_type, ESTIMATED_SIZE_DEFAULT)
+
+    def to_dict(self) -> dict:
+        return {
+            "bytes_loaded": self.bytes_loaded,
+            "bytes_saved_estimate": self.bytes_saved_estimate,
+            "allowed_requests": self.allowed_requests,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "over_budget": self.over_budget,
+            "over_time": self.over_time,
+        }
+
+
+class ContextInterceptor:
+    """
+    Intercettazione per context, a tre livelli:
+    - blocchi statici (estensioni, tracker noti) nativi nel browser via CDP,
+      impostati una volta per pagina: nessun round-trip Python per richiesta
+    - domini di terze parti: route con regex valutata dal browser, il callback
+      Python vede solo le richieste da bloccare
+    - budget di byte e di tempo: contati dagli eventi (dimensioni reali del
+      trasferimento); superati, una route catch-all lascia passare solo i documenti
+    I contatori puntano alla PageBudget della pagina corrente.
+    """
+
+    def __init__(self, policy: InterceptionPolicy):
+        self.policy = policy
+        self.budget: Optional[PageBudget] = None
+        self._context: Optional[BrowserContext] = None
+        self._cut_off = False
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def install(self, context: BrowserContext):
+        self._context = context
+        third_party = self.policy.third_party_pattern()
+        if third_party is not None:
+            await context.route(third_party, self._abort_third_party)
+        context.on("requestfinished", self._on_request_finished)
+        context.on("requestfailed", self._on_request_failed)
+
+    async def start_page(self, page: Page) -> PageBudget:
+        """Nuovi contatori e blocchi nativi per la pagina, avvio del budget di tempo"""
+        self.finish_page()
+        if self._cut_off:
+            self._cut_off = False
+            await self._context.unroute("**/*", self._abort_subresource)
+        self.budget = PageBudget()
+
+        patterns = self.policy.native_block_patterns()
+        if patterns:
+            try:
+                cdp = await page.context.new_cdp_session(page)
+                await cdp.send("Network.enable")
+                await cdp.send("Network.setBlockedURLs", {"urls": patterns})
+            except PlaywrightError as e:  # browser non Chromium
+                logger.debug(f"Native URL blocking unavailable: {e}")
+
+        if self.policy.time_budget:
+            budget = self.budget
+            self._timer = asyncio.get_running_loop().call_later(
+                self.policy.time_budget,
+                lambda: asyncio.ensure_future(self._over_time(budget))
+            )
+        return self.budget
+
+    def finish_page(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @staticmethod
+    def _is_main_document(request: Request) -> bool:
+        return (
+            request.resource_type == "document"
+            and request.is_navigation_request()
+            and request.frame.parent_frame is None
+        )
+
+    async def _abort_third_party(self, route: Route):
+        if self._is_main_document(route.request):
+            await route.continue_()  # redirect della navigazione principale verso un altro dominio
+        else:
+            await route.abort("blockedbyclient")
+
+    async def _abort_subresource(self, route: Route):
+        if self._is_main_document(route.request):
+            await route.continue_()
+        else:
+            await route.abort("blockedbyclient")
+
+    async def _cut_off_subresources(self):
+        if not self._cut_off and self._context is not None:
+            self._cut_off = True
+            await self._context.route("**/*", self._abort_subresource)
+
+    async def _over_time(self, budget: PageBudget):
+        if budget is self.budget:
+            budget.over_time = True
+            await self._cut_off_subresources()
+
+    async def _on_request_finished(self, request: Request):
+        budget = self.budget
+        if budget is None:
+            return
+        budget.allowed_requests += 1
+        try:
+            sizes = await request.sizes()  # byte reali anche per risposte chunked/compresse
+        except PlaywrightError:
+            return  # pagina già chiusa
+        budget.bytes_loaded += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        if budget.bytes_loaded >= self.policy.byte_budget and budget is self.budget:
+            budget.over_budget = True
+            await self._cut_off_subresources()
+
+    def _on_request_failed(self, request: Request):
+        if self.budget is not None and request.failure == BLOCKED_ERROR:
+            self.budget.block(request.resource_type)
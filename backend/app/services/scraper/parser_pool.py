@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import time
+import logging
+from ...schemas.schemas import PriceComparisonBase
+from .sources import SourceAdapter, get_source, parse_listing
+
+logger = logging.getLogger(__name__)
+
+PARSE_INLINE = "inline"
+PARSE_THREAD = "thread"
+PARSE_PROCESS = "process"
+
+
+def _timed_parse(adapter: SourceAdapter, html: str) -> Tuple[List[PriceComparisonBase], float]:
+    start = time.perf_counter()
+    results = parse_listing(adapter, html)
+    return results, time.perf_counter() - start
+
+
+def _parse_in_process(source_id: str, html: str) -> Tuple[List[dict], float]:
+    """
+    Eseguito nel processo figlio: l'adapter (selettori compilati, strainer)
+    non è serializzabile, quindi viene ripreso dal registro per id
+    """
+    start = time.perf_counter()
+    adapter = get_source(source_id)
+    if adapter is None:
+        raise ValueError(f"Fonte sconosciuta: {source_id}")
+    results = [r.model_dump() for r in parse_listing(adapter, html)]
+    return results, time.perf_counter() - start
+
+
+class ParserPool:
+    """
+    Parsing HTML fuori dall'event loop
+    - inline: sul thread del loop (nessun overhead, blocca il loop)
+    - thread: ThreadPoolExecutor; libera l'event loop ma resta legato al GIL
+      (il tree builder di BeautifulSoup esegue callback Python per ogni nodo),
+      quindi usa un solo core
+    - process: ProcessPoolExecutor (default: più core; risultati restituiti come dict compatti)
+    Il tempo di parsing viene misurato separatamente da quello di rete.
+    """
+
+    def __init__(self, mode: str, workers: int):
+        if mode not in (PARSE_INLINE, PARSE_THREAD, PARSE_PROCESS):
+            logger.warning(f"Unknown parse executor '{mode}', using '{PARSE_PROCESS}'")
+            mode = PARSE_PROCESS
+        self.mode = mode
+        self.workers = max(1, workers)
+        self._executor: Optional[Executor] = None
+        self.parses = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == PARSE_PROCESS:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="html-parse")
+        return self._executor
+
+    async def parse(self, adapter: SourceAdapter, html: str) -> Tuple[List[PriceComparisonBase], float]:
+        """Restituisce (risultati, secondi di parsing)"""
+        if self.mode == PARSE_INLINE:
+            results, elapsed = _timed_parse(adapter, html)
+        elif self.mode == PARSE_PROCESS:
+            loop = asyncio.get_running_loop()
+            payload, elapsed = await loop.run_in_executor(self._get_executor(), _parse_in_process, adapter.id, html)
+            results = [PriceComparisonBase(**r) for r in payload]
+        else:
+            loop = asyncio.get_running_loop()
+            results, elapsed = await loop.run_in_executor(self._get_executor(), _timed_parse, adapter, html)
+
+        self.parses += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        return results, elapsed
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "parses": self.parses,
+            "avg_parse_ms": round(self.total_time / self.parses * 1000, 1) if self.parses else 0,
+            "max_parse_ms": round(self.max_time * 1000, 1),
+        }
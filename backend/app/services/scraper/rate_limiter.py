@@ -0,0 +1,139 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket asincrono
+    - `rate` token al secondo, fino a `burst` accumulabili
+    - Le richieste in eccesso si mettono in coda (FIFO) invece di fallire
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Attende un token; restituisce i secondi passati in coda"""
+        if self.rate <= 0:
+            return 0.0
+
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+        return time.monotonic() - start
+
+
+@dataclass
+class _SourceLimit:
+    bucket: TokenBucket
+    semaphore: asyncio.Semaphore
+    max_in_flight: int
+    in_flight: int = 0
+    waiting: int = 0
+    admitted: int = 0
+    wait_time: float = 0.0
+    max_wait: float = 0.0
+
+
+class SourceGovernor:
+    """
+    Rate limiter e governatore di concorrenza per fonte (host)
+    - Token bucket per il ritmo delle richieste
+    - Semaforo per il numero massimo di richieste in volo
+    Condiviso da tutte le ricerche del processo.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_in_flight: int,
+        overrides: Optional[Dict[str, float]] = None
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max(1, max_in_flight)
+        self.overrides = overrides or {}
+        self._limits: Dict[str, _SourceLimit] = {}
+
+    def _limit(self, source: str) -> _SourceLimit:
+        limit = self._limits.get(source)
+        if limit is None:
+            rate = self.overrides.get(source, self.rate)
+            limit = _SourceLimit(
+                bucket=TokenBucket(rate, self.burst),
+                semaphore=asyncio.Semaphore(self.max_in_flight),
+                max_in_flight=self.max_in_flight
+            )
+            self._limits[source] = limit
+        return limit
+
+    @asynccontextmanager
+    async def slot(self, source: str) -> AsyncIterator[None]:
+        """Attende uno slot libero e un token per la fonte"""
+        limit = self._limit(source)
+        start = time.monotonic()
+        limit.waiting += 1
+        try:
+            await limit.semaphore.acquire()
+        finally:
+            limit.waiting -= 1
+
+        try:
+            limit.waiting += 1
+            try:
+                await limit.bucket.acquire()
+            finally:
+                limit.waiting -= 1
+
+            waited = time.monotonic() - start
+            limit.admitted += 1
+            limit.wait_time += waited
+            limit.max_wait = max(limit.max_wait, waited)
+            limit.in_flight += 1
+            try:
+                yield
+            finally:
+                limit.in_flight -= 1
+        finally:
+            limit.semaphore.release()
+
+    def has_capacity(self, source: str) -> bool:
+        """True se la fonte ammetterebbe una richiesta subito (nessuna coda, token disponibile)"""
+        limit = self._limit(source)
+        if limit.waiting or limit.in_flight >= limit.max_in_flight:
+            return False
+        if limit.bucket.rate <= 0:
+            return True
+        limit.bucket._refill()
+        return limit.bucket.tokens >= 1
+
+    def stats(self) -> dict:
+        return {
+            source: {
+                "rate_per_sec": limit.bucket.rate,
+                "max_in_flight": limit.max_in_flight,
+                "in_flight": limit.in_flight,
+                "waiting": limit.waiting,
+                "admitted": limit.admitted,
+                "avg_wait_ms": int(limit.wait_time / limit.admitted * 1000) if limit.admitted else 0,
+                "max_wait_ms": int(limit.max_wait * 1000),
+            }
+            for source, limit in self._limits.items()
+        }
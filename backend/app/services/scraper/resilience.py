@@ -0,0 +1,140 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+import time
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class LatencyTracker:
+    """Finestra mobile delle latenze riuscite di una fonte"""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per fonte
+    - closed: richieste ammesse, conta i fallimenti consecutivi
+    - open: fonte saltata fino alla fine del cooldown
+    - half_open: una sola richiesta di prova; se riesce il circuito si richiude
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_progress = False
+        self.total_failures = 0
+        self.total_successes = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == BREAKER_OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = BREAKER_HALF_OPEN
+            self.trial_in_progress = False
+
+        if self.state == BREAKER_HALF_OPEN:
+            if self.trial_in_progress:
+                self.rejected += 1
+                return False
+            self.trial_in_progress = True
+        return True
+
+    def record_success(self):
+        self.total_successes += 1
+        self.consecutive_failures = 0
+        self.trial_in_progress = False
+        self.state = BREAKER_CLOSED
+
+    def record_failure(self):
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.trial_in_progress = False
+        if self.state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = BREAKER_OPEN
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Tentativo annullato senza esito (hedge perdente, client disconnesso): la prova resta da fare"""
+        self.trial_in_progress = False
+
+    def retry_in(self) -> Optional[float]:
+        if self.state != BREAKER_OPEN:
+            return None
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class SourceHealth:
+    """Latenze, hedging e circuit breaker per tutte le fonti"""
+
+    def __init__(self, failure_threshold: int, cooldown: float, hedge_min_samples: int):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.hedge_min_samples = hedge_min_samples
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._hedges: Dict[str, int] = {}
+        self._hedge_wins: Dict[str, int] = {}
+
+    def breaker(self, source: str) -> CircuitBreaker:
+        if source not in self._breakers:
+            self._breakers[source] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return self._breakers[source]
+
+    def latency(self, source: str) -> LatencyTracker:
+        if source not in self._latencies:
+            self._latencies[source] = LatencyTracker()
+        return self._latencies[source]
+
+    def hedge_delay(self, source: str) -> Optional[float]:
+        """Dopo quanto lanciare un secondo tentativo (p95), se ci sono abbastanza campioni"""
+        tracker = self.latency(source)
+        if len(tracker.samples) < self.hedge_min_samples:
+            return None
+        return tracker.percentile(95)
+
+    def record_hedge(self, source: str, won: bool):
+        self._hedges[source] = self._hedges.get(source, 0) + 1
+        if won:
+            self._hedge_wins[source] = self._hedge_wins.get(source, 0) + 1
+
+    def source_stats(self, source: str) -> dict:
+        breaker = self.breaker(source)
+        tracker = self.latency(source)
+        p50 = tracker.percentile(50)
+        p95 = tracker.percentile(95)
+        retry_in = breaker.retry_in()
+        return {
+            "breaker": breaker.state,
+            "consecutive_failures": breaker.consecutive_failures,
+            "retry_in_s": round(retry_in, 1) if retry_in is not None else None,
+            "failures": breaker.total_failures,
+            "successes": breaker.total_successes,
+            "rejected": breaker.rejected,
+            "p50_ms": int(p50 * 1000) if p50 is not None else None,
+            "p95_ms": int(p95 * 1000) if p95 is not None else None,
+            "hedges": self._hedges.get(source, 0),
+            "hedge_wins": self._hedge_wins.get(source, 0),
+        }
+
+    def stats(self) -> dict:
+        sources = set(self._breakers) | set(self._latencies)
+        return {source: self.source_stats(source) for source in sorted(sources)}
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import hashlib
+import json
+import time
+import logging
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from ...schemas.schemas import ScrapeResult
+
+logger = logging.getLogger(__name__)
+
+REDIS_RETRY_AFTER = 30  # secondi prima di ritentare Redis dopo un errore
+
+
+@dataclass
+class CacheEntry:
+    result: ScrapeResult
+    stored_at: float
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+class SearchResultCache:
+    """
+    Cache a due livelli dei risultati per fonte
+    - L1: LRU in-process (limitata a `max_entries`)
+    - L2: Redis condiviso tra i worker uvicorn
+    - Entry fresche per `ttl` secondi, servibili come stale fino a `ttl + stale_ttl`
+    """
+
+    def __init__(self, redis_url: Optional[str], ttl: int, stale_ttl: int, max_entries: int):
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max(1, max_entries)
+        self._local: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._redis: Optional[aioredis.Redis] = None
+        self._redis_down_until = 0.0
+        self.counters = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "redis_hits": 0, "redis_errors": 0}
+
+    @staticmethod
+    def key(source: str, query: str, barcode: Optional[str] = None) -> str:
+        digest = hashlib.sha1(f"{normalize_query(query)}|{barcode or ''}".encode()).hexdigest()
+        return f"pinkhouse:search:{source}:{digest}"
+
+    def _redis_client(self) -> Optional[aioredis.Redis]:
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.redis_url, socket_timeout=1, socket_connect_timeout=1)
+        return self._redis
+
+    def _redis_failed(self, e: Exception):
+        self.counters["redis_errors"] += 1
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+        logger.warning(f"Redis cache unavailable, using local cache only: {e}")
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Tuple[ScrapeResult, bool]]:
+        """Restituisce (risultato, is_stale) oppure None se assente o scaduto"""
+        entry = self._local.get(key)
+        if entry is not None:
+            self._local.move_to_end(key)
+        else:
+            entry = await self._redis_get(key)
+            if entry is not None:
+                self.counters["redis_hits"] += 1
+                self._remember(key, entry)
+
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+
+        age = time.time() - entry.stored_at
+        if age < self.ttl:
+            self.counters["fresh_hits"] += 1
+            return entry.result, False
+        if age < self.ttl + self.stale_ttl:
+            self.counters["stale_hits"] += 1
+            return entry.result, True
+
+        self._local.pop(key, None)
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, result: ScrapeResult):
+        entry = CacheEntry(result=result, stored_at=time.time())
+        self._remember(key, entry)
+
+        client = self._redis_client()
+        if client is None:
+            return
+        payload = json.dumps({"stored_at": entry.stored_at, "result": result.model_dump(mode="json")})
+        try:
+            await client.set(key, payload, ex=self.ttl + self.stale_ttl)
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+
+    async def _redis_get(self, key: str) -> Optional[CacheEntry]:
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(key)
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+            return None
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return CacheEntry(result=ScrapeResult(**data["result"]), stored_at=data["stored_at"])
+
+    async def clear(self):
+        self._local.clear()
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            async for key in client.scan_iter(match="pinkhouse:search:*", count=500):
+                await client.delete(key)
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def stats(self) -> dict:
+        return {
+            "local_entries": len(self._local),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "redis": bool(self.redis_url) and time.monotonic() >= self._redis_down_until,
+            **self.counters
+        }
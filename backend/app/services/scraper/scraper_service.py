@@ -1,43 +1,131 @@
 import asyncio
-from playwright.async_api import async_playwright, Browser, Page
-from bs4 import BeautifulSoup
+from playwright.async_api import async_playwright, Browser, Page, Playwright, TimeoutError as PlaywrightTimeout
 import httpx
-import re
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Tuple
 from datetime import datetime
-import json
+import time
 import logging
 from ...core.config import settings
-from ...schemas.schemas import PriceComparisonBase, Availability, ScrapeResult
+from ...schemas.schemas import PriceComparisonBase, ScrapeResult
+from .context_pool import BrowserContextPool, CONTEXT_OPTIONS
+from .rate_limiter import SourceGovernor
+from .result_cache import SearchResultCache
+from .single_flight import SingleFlight
+from .resilience import SourceHealth
+from .worker_pool import ScraperWorkerPool
+from .parser_pool import ParserPool
+from .sources import SourceAdapter, FETCH_HTTP, FETCH_BROWSER, get_source, list_sources
 
 logger = logging.getLogger(__name__)
 
+HTTP_HEADERS = {
+    "User-Agent": CONTEXT_OPTIONS["user_agent"],
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "it-IT,it;q=0.9,en;q=0.8",
+}
+
 
 class ScraperService:
     """
-    Web scraping multi-source con Playwright
-    - Supporta JavaScript rendering
-    - Rate limiting rispettoso
-    - Caching risultati
+    Web scraping multi-source: HTTP diretto, Playwright come fallback
+    - Client httpx condiviso (HTTP/2, keep-alive) per le pagine server-side
+    - Playwright per le pagine che richiedono JavaScript rendering
+    - Rate limiting per fonte (token bucket + max richieste in volo)
+    - Cache per fonte (LRU locale + Redis) con stale-while-revalidate
+    - Coalescing degli scraping identici concorrenti (single-flight)
+    - Budget di latenza, tentativi hedged e circuit breaker per fonte
+    - Opzionale: scraping e parsing in processi worker separati dall'API
     - Fallback su ScraperAPI per siti difficili
+    - Pool di browser context riutilizzabili per fonte
     """
     
     def __init__(self):
+        self.playwright: Optional[Playwright] = None
         self.browser: Optional[Browser] = None
-        self.cache: Dict[str, Any] = {}  # Simple in-memory cache
-        self.cache_ttl = settings.CACHE_TTL
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self._browser_lock = asyncio.Lock()
+        self.fetch_stats: Dict[str, Dict[str, int]] = {}  # contatori per fonte: tier e traffico
+        self.cache = SearchResultCache(
+            redis_url=settings.REDIS_URL if settings.CACHE_REDIS_ENABLED else None,
+            ttl=settings.CACHE_TTL,
+            stale_ttl=settings.CACHE_STALE_TTL,
+            max_entries=settings.CACHE_LOCAL_MAX_ENTRIES
+        )
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.single_flight = SingleFlight()
+        self.health = SourceHealth(
+            failure_threshold=settings.SCRAPE_BREAKER_FAILURES,
+            cooldown=settings.SCRAPE_BREAKER_COOLDOWN,
+            hedge_min_samples=settings.SCRAPE_HEDGE_MIN_SAMPLES
+        )
+        self.worker_pool: Optional[ScraperWorkerPool] = None
+        self.context_pool = BrowserContextPool(
+            max_size=settings.SCRAPE_CONTEXT_POOL_SIZE,
+            max_uses=settings.SCRAPE_CONTEXT_MAX_USES,
+            warm=settings.SCRAPE_CONTEXT_WARM,
+            policy_for=lambda source: get_source(source).interception
+        )
+        self.governor = SourceGovernor(
+            rate=settings.SCRAPE_RATE_LIMIT,
+            burst=settings.SCRAPE_RATE_BURST,
+            max_in_flight=settings.SCRAPE_MAX_IN_FLIGHT,
+            overrides=settings.SCRAPE_RATE_LIMIT_OVERRIDES
+        )
+        self.parser = ParserPool(mode=settings.SCRAPE_PARSE_EXECUTOR, workers=settings.SCRAPE_PARSE_WORKERS)
         
-    async def init_browser(self):
-        """Inizializza browser Playwright"""
-        if self.browser is None:
-            playwright = await async_playwright().start()
-            self.browser = await playwright.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-dev-shm-usage']
+    def init_http_client(self):
+        """Inizializza il client HTTP condiviso (pool di connessioni keep-alive)"""
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(
+                http2=True,
+                headers=HTTP_HEADERS,
+                follow_redirects=True,
+                timeout=httpx.Timeout(settings.SCRAPE_HTTP_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.SCRAPE_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SCRAPE_HTTP_MAX_CONNECTIONS
+                )
             )
     
+    async def init_browser(self):
+        """Inizializza browser Playwright e pre-riscalda il pool di context"""
+        async with self._browser_lock:
+            if self.browser is not None and not self.browser.is_connected():
+                await self._close_browser()
+            if self.browser is None:
+                if self.playwright is None:
+                    self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=True,
+                    args=['--no-sandbox', '--disable-dev-shm-usage']
+                )
+                await self.context_pool.start(
+                    self.browser,
+                    [adapter.id for adapter in list_sources() if adapter.fetch_tier == FETCH_BROWSER]
+                )
+    
+    def start_workers(self, workers: int, concurrency: int):
+        """Sposta fetch e parsing in un pool di processi worker (ognuno col proprio browser)"""
+        if self.worker_pool is None:
+            self.worker_pool = ScraperWorkerPool(workers=workers, concurrency=concurrency)
+        self.worker_pool.start()
+    
     async def close(self):
-        """Chiude il browser"""
+        """Chiude worker, client HTTP, context, browser e Playwright"""
+        if self.worker_pool:
+            await self.worker_pool.close()
+            self.worker_pool = None
+        if self.http_client:
+            await self.http_client.aclose()
+            self.http_client = None
+        await self._close_browser()
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        await self.cache.close()
+        self.parser.close()
+    
+    async def _close_browser(self):
+        await self.context_pool.close()
         if self.browser:
             try:
                 await self.browser.close()
@@ -45,368 +133,303 @@ class ScraperService:
                 logger.warning(f"Error closing browser: {e}")
             finally:
                 self.browser = None
+        if self.playwright:
+            try:
+                await self.playwright.stop()
+            except Exception as e:
+                logger.warning(f"Error stopping Playwright: {e}")
+            finally:
+                self.playwright = None
+    
+    def stats(self) -> dict:
+        """Statistiche runtime dello scraper"""
+        return {
+            "context_pool": self.context_pool.stats(),
+            "rate_limits": self.governor.stats(),
+            "fetch": self.fetch_stats,
+            "parse": self.parser.stats(),
+            "cache": {**self.cache.stats(), "refreshing": len(self._refreshing)},
+            "single_flight": self.single_flight.stats(),
+            "health": self.health.stats(),
+            "workers": self.worker_pool.stats() if self.worker_pool else None
+        }
     
     async def search_all_sources(
         self, 
         query: str, 
         barcode: Optional[str] = None,
-        sources: List[str] = None
+        sources: List[str] = None,
+        use_cache: bool = True
     ) -> List[ScrapeResult]:
-        """Cerca su tutti i source in parallelo"""
-        
-        if sources is None:
-            sources = ["amazon", "eprice", "unieuro", "mediaworld", "trovaprezzi"]
-        
-        await self.init_browser()
-        
-        # Esegui scraping in parallelo
-        tasks = []
-        for source in sources:
-            if source == "amazon":
-                tasks.append(self._scrape_amazon(query, barcode))
-            elif source == "eprice":
-                tasks.append(self._scrape_eprice(query, barcode))
-            elif source == "unieuro":
-                tasks.append(self._scrape_unieuro(query, barcode))
-            elif source == "mediaworld":
-                tasks.append(self._scrape_mediaworld(query, barcode))
-            elif source == "trovaprezzi":
-                tasks.append(self._scrape_trovaprezzi(query, barcode))
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        """
+        Cerca su tutti i source in parallelo
         
-        # Processa risultati
-        scrape_results = []
-        for i, result in enumerate(results):
-            source = sources[i]
-            if isinstance(result, Exception):
-                logger.error(f"Scrape error for {source}: {result}")
-                scrape_results.append(ScrapeResult(
-                    source=source,
-                    results=[],
-                    scraped_at=datetime.utcnow(),
-                    success=False,
-                    error=str(result)
-                ))
-            else:
-                scrape_results.append(ScrapeResult(
-                    source=source,
-                    results=result,
-                    scraped_at=datetime.utcnow(),
-                    success=True
-                ))
-        
-        return scrape_results
-    
-    async def _get_page(self) -> Page:
-        """Crea una nuova pagina con stealth settings"""
-        context = await self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            locale='it-IT'
-        )
-        page = await context.new_page()
-        
-        # Block unnecessary resources
-        await page.route("**/*.{png,jpg,jpeg,gif,svg,ico,woff,woff2}", lambda route: route.abort())
-        
-        return page
+        Ogni fonte è in cache separatamente: un miss parziale
+        esegue lo scraping solo delle fonti mancanti.
+        """
+        results = {
+            result.source: result
+            async for result in self.iter_search_all_sources(query, barcode, sources, use_cache)
+        }
+        return [results[source] for source in self._resolve_sources(sources) if source in results]
     
-    async def _scrape_amazon(self, query: str, barcode: Optional[str] = None) -> List[PriceComparisonBase]:
-        """Scrape Amazon.it"""
-        results = []
-        page = await self._get_page()
-        
+    async def iter_search_all_sources(
+        self,
+        query: str,
+        barcode: Optional[str] = None,
+        sources: List[str] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[ScrapeResult]:
+        """
+        Come search_all_sources, ma restituisce ogni ScrapeResult appena
+        la sua fonte ha finito. Una fonte oltre SCRAPE_SOURCE_DEADLINE
+        viene riportata come timeout (lo scraping condiviso prosegue
+        e popola comunque la cache).
+        """
+        adapters = [get_source(s) for s in self._resolve_sources(sources)]
+        tasks = [
+            asyncio.create_task(self._search_source_with_deadline(adapter, query, barcode, use_cache))
+            for adapter in adapters
+        ]
         try:
-            search_term = barcode if barcode else query
-            url = f"https://www.amazon.it/s?k={search_term.replace(' ', '+')}"
-            
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await asyncio.sleep(2)  # Rate limiting
-            
-            # Attendi risultati
-            await page.wait_for_selector('[data-component-type="s-search-result"]', timeout=10000)
-            
-            content = await page.content()
-            soup = BeautifulSoup(content, 'lxml')
-            
-            items = soup.select('[data-component-type="s-search-result"]')[:10]
-            
-            for item in items:
-                try:
-                    # Titolo
-                    title_el = item.select_one('h2 a span')
-                    if not title_el:
-                        continue
-                    
-                    # Link
-                    link_el = item.select_one('h2 a')
-                    link = f"https://www.amazon.it{link_el['href']}" if link_el else None
-                    
-                    # Prezzo
-                    price_whole = item.select_one('.a-price-whole')
-                    price_frac = item.select_one('.a-price-fraction')
-                    if price_whole:
-                        price_str = price_whole.get_text(strip=True).replace('.', '').replace(',', '')
-                        frac = price_frac.get_text(strip=True) if price_frac else '00'
-                        price = float(f"{price_str}.{frac}")
-                    else:
-                        continue
-                    
-                    # Disponibilità
-                    avail_el = item.select_one('.a-color-success')
-                    availability = Availability.IN_STOCK if avail_el else Availability.UNKNOWN
-                    
-                    # Spedizione
-                    shipping_el = item.select_one('[data-cy="delivery-recipe"]')
-                    shipping_time = shipping_el.get_text(strip=True) if shipping_el else None
-                    
-                    results.append(PriceComparisonBase(
-                        source="amazon",
-                        source_url=link,
-                        price=price,
-                        availability=availability,
-                        shipping_time=shipping_time,
-                        seller_name="Amazon"
-                    ))
-                    
-                except Exception as e:
-                    logger.debug(f"Error parsing Amazon item: {e}")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"Amazon scrape failed: {e}")
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
         finally:
-            await page.close()
-        
-        return results
+            for task in tasks:
+                task.cancel()
     
-    async def _scrape_eprice(self, query: str, barcode: Optional[str] = None) -> List[PriceComparisonBase]:
-        """Scrape ePRICE.it"""
-        results = []
-        page = await self._get_page()
-        
+    def _resolve_sources(self, sources: Optional[List[str]]) -> List[str]:
+        if sources is None:
+            return [adapter.id for adapter in list_sources()]
+        return [s for s in dict.fromkeys(sources) if get_source(s)]
+    
+    async def _search_source_with_deadline(
+        self,
+        adapter: SourceAdapter,
+        query: str,
+        barcode: Optional[str],
+        use_cache: bool
+    ) -> ScrapeResult:
         try:
-            search_term = barcode if barcode else query
-            url = f"https://www.eprice.it/s/?k={search_term.replace(' ', '%20')}"
-            
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await asyncio.sleep(1.5)
-            
-            content = await page.content()
-            soup = BeautifulSoup(content, 'lxml')
-            
-            items = soup.select('.productCard')[:10]
-            
-            for item in items:
-                try:
-                    title_el = item.select_one('.productCard__title')
-                    if not title_el:
-                        continue
-                    
-                    link_el = item.select_one('a.productCard__link')
-                    link = link_el['href'] if link_el else None
-                    
-                    price_el = item.select_one('.productCard__price')
-                    if price_el:
-                        price_text = price_el.get_text(strip=True)
-                        price_match = re.search(r'[\d.,]+', price_text.replace('.', '').replace(',', '.'))
-                        if price_match:
-                            price = float(price_match.group())
-                        else:
-                            continue
-                    else:
-                        continue
-                    
-                    results.append(PriceComparisonBase(
-                        source="eprice",
-                        source_url=link,
-                        price=price,
-                        availability=Availability.IN_STOCK,
-                        seller_name="ePRICE"
-                    ))
-                    
-                except Exception as e:
-                    logger.debug(f"Error parsing ePRICE item: {e}")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"ePRICE scrape failed: {e}")
-        finally:
-            await page.close()
+            return await asyncio.wait_for(
+                self._search_source(adapter, query, barcode, use_cache),
+                timeout=settings.SCRAPE_SOURCE_DEADLINE
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"{adapter.id}: no result within {settings.SCRAPE_SOURCE_DEADLINE}s")
+            return ScrapeResult(
+                source=adapter.id,
+                results=[],
+                scraped_at=datetime.utcnow(),
+                success=False,
+                error="timeout",
+                timed_out=True
+            )
+    
+    async def _search_source(
+        self,
+        adapter: SourceAdapter,
+        query: str,
+        barcode: Optional[str],
+        use_cache: bool
+    ) -> ScrapeResult:
+        """Risultato per una fonte: cache fresca, cache stale + refresh, oppure scraping"""
+        key = self.cache.key(adapter.id, query, barcode)
+        
+        if use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                result, is_stale = cached
+                if is_stale:
+                    self._schedule_refresh(key, adapter, query, barcode)
+                return result.model_copy(update={"cached": True})
         
-        return results
+        # Chiamanti concorrenti con la stessa (query, barcode, fonte) condividono uno scraping
+        return await self.single_flight.do(
+            key, lambda: self._scrape_and_store(key, adapter, query, barcode)
+        )
     
-    async def _scrape_unieuro(self, query: str, barcode: Optional[str] = None) -> List[PriceComparisonBase]:
-        """Scrape Unieuro.it"""
-        results = []
-        page = await self._get_page()
+    async def _scrape_and_store(
+        self,
+        key: str,
+        adapter: SourceAdapter,
+        query: str,
+        barcode: Optional[str]
+    ) -> ScrapeResult:
+        breaker = self.health.breaker(adapter.id)
+        if not breaker.allow():
+            return ScrapeResult(
+                source=adapter.id,
+                results=[],
+                scraped_at=datetime.utcnow(),
+                success=False,
+                error="circuit open"
+            )
         
         try:
-            search_term = barcode if barcode else query
-            url = f"https://www.unieuro.it/online/ricerca?q={search_term.replace(' ', '+')}"
-            
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await asyncio.sleep(1.5)
-            
-            content = await page.content()
-            soup = BeautifulSoup(content, 'lxml')
-            
-            items = soup.select('.product-card')[:10]
-            
-            for item in items:
-                try:
-                    title_el = item.select_one('.product-card__title')
-                    if not title_el:
-                        continue
-                    
-                    link_el = item.select_one('a')
-                    link = f"https://www.unieuro.it{link_el['href']}" if link_el else None
-                    
-                    price_el = item.select_one('.product-card__price')
-                    if price_el:
-                        price_text = price_el.get_text(strip=True)
-                        price_match = re.search(r'[\d.,]+', price_text.replace('.', '').replace(',', '.'))
-                        if price_match:
-                            price = float(price_match.group())
-                        else:
-                            continue
-                    else:
-                        continue
-                    
-                    results.append(PriceComparisonBase(
-                        source="unieuro",
-                        source_url=link,
-                        price=price,
-                        availability=Availability.IN_STOCK,
-                        seller_name="Unieuro"
-                    ))
-                    
-                except Exception as e:
-                    logger.debug(f"Error parsing Unieuro item: {e}")
-                    continue
-                    
+            results, scrape_stats = await self._hedged_scrape(adapter, query, barcode)
+        except asyncio.CancelledError:
+            # nessun esito: senza rilascio una prova half-open annullata bloccherebbe la fonte
+            breaker.release_trial()
+            raise
         except Exception as e:
-            logger.error(f"Unieuro scrape failed: {e}")
-        finally:
-            await page.close()
+            breaker.record_failure()
+            error = str(e) or type(e).__name__
+            logger.error(f"Scrape error for {adapter.id}: {error}")
+            return ScrapeResult(
+                source=adapter.id,
+                results=[],
+                scraped_at=datetime.utcnow(),
+                success=False,
+                error=error
+            )
         
-        return results
+        breaker.record_success()
+        result = ScrapeResult(
+            source=adapter.id,
+            results=results,
+            scraped_at=datetime.utcnow(),
+            success=True,
+            stats=scrape_stats
+        )
+        await self.cache.set(key, result)
+        return result
     
-    async def _scrape_mediaworld(self, query: str, barcode: Optional[str] = None) -> List[PriceComparisonBase]:
-        """Scrape MediaWorld.it"""
-        results = []
-        page = await self._get_page()
-        
+    def _schedule_refresh(self, key: str, adapter: SourceAdapter, query: str, barcode: Optional[str]):
+        """Un solo refresh in background per chiave"""
+        if key in self._refreshing or self.single_flight.in_flight(key):
+            return
+        task = asyncio.create_task(self.single_flight.do(
+            key, lambda: self._scrape_and_store(key, adapter, query, barcode)
+        ))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+    
+    async def _hedged_scrape(self, adapter: SourceAdapter, query: str, barcode: Optional[str]) -> Tuple[List[PriceComparisonBase], dict]:
+        """
+        Primo tentativo; se supera il p95 storico della fonte parte un
+        secondo tentativo in parallelo e vince il primo che riesce
+        """
+        primary = asyncio.create_task(self._attempt(adapter, query, barcode))
+        tasks = {primary}
         try:
-            search_term = barcode if barcode else query
-            url = f"https://www.mediaworld.it/search?query={search_term.replace(' ', '%20')}"
-            
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await asyncio.sleep(1.5)
-            
-            content = await page.content()
-            soup = BeautifulSoup(content, 'lxml')
+            hedge_after = self.health.hedge_delay(adapter.id) if settings.SCRAPE_HEDGE_ENABLED else None
+            if hedge_after is None:
+                return await primary
             
-            items = soup.select('[data-test="mms-product-card"]')[:10]
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return primary.result()
             
-            for item in items:
-                try:
-                    title_el = item.select_one('[data-test="product-title"]')
-                    if not title_el:
-                        continue
-                    
-                    link_el = item.select_one('a')
-                    link = f"https://www.mediaworld.it{link_el['href']}" if link_el else None
-                    
-                    price_el = item.select_one('[data-test="product-price"]')
-                    if price_el:
-                        price_text = price_el.get_text(strip=True)
-                        price_match = re.search(r'[\d.,]+', price_text.replace('.', '').replace(',', '.'))
-                        if price_match:
-                            price = float(price_match.group())
-                        else:
-                            continue
-                    else:
-                        continue
-                    
-                    results.append(PriceComparisonBase(
-                        source="mediaworld",
-                        source_url=link,
-                        price=price,
-                        availability=Availability.IN_STOCK,
-                        seller_name="MediaWorld"
-                    ))
-                    
-                except Exception as e:
-                    logger.debug(f"Error parsing MediaWorld item: {e}")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"MediaWorld scrape failed: {e}")
+            hedge = asyncio.create_task(self._attempt(adapter, query, barcode))
+            tasks.add(hedge)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.health.record_hedge(adapter.id, won=task is hedge)
+                        return task.result()
+                    error = task.exception()
+            self.health.record_hedge(adapter.id, won=False)
+            raise error
         finally:
-            await page.close()
-        
-        return results
+            for task in tasks:
+                task.cancel()
+    
+    async def _attempt(self, adapter: SourceAdapter, query: str, barcode: Optional[str]) -> Tuple[List[PriceComparisonBase], dict]:
+        """Un tentativo di scraping, nel budget di latenza della fonte"""
+        async with self.governor.slot(adapter.id):
+            start = time.monotonic()
+            try:
+                outcome = await asyncio.wait_for(
+                    self._dispatch(adapter, query, barcode),
+                    timeout=adapter.latency_budget
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{adapter.id} over latency budget ({adapter.latency_budget}s)")
+            self.health.latency(adapter.id).record(time.monotonic() - start)
+            return outcome
+    
+    async def _dispatch(self, adapter: SourceAdapter, query: str, barcode: Optional[str]) -> Tuple[List[PriceComparisonBase], dict]:
+        """Scraping nel processo worker se il pool è attivo, altrimenti in-process"""
+        if self.worker_pool and self.worker_pool.running:
+            return await self.worker_pool.submit(adapter.id, query, barcode, adapter.latency_budget)
+        return await self._scrape_source(adapter, query, barcode)
     
-    async def _scrape_trovaprezzi(self, query: str, barcode: Optional[str] = None) -> List[PriceComparisonBase]:
-        """Scrape TrovaPrezzi.it - aggregatore prezzi"""
-        results = []
-        page = await self._get_page()
+    def _count_fetch(self, source: str, tier: str, traffic: Optional[dict] = None):
+        counters = self.fetch_stats.setdefault(source, {
+            "http": 0, "browser": 0, "fallback": 0,
+            "bytes_loaded": 0, "bytes_saved_estimate": 0, "blocked_requests": 0
+        })
+        counters[tier] += 1
+        for name in ("bytes_loaded", "bytes_saved_estimate", "blocked_requests"):
+            counters[name] += (traffic or {}).get(name, 0)
+    
+    async def _fetch_html(self, adapter: SourceAdapter, url: str, stats: dict) -> str:
+        """
+        HTML della pagina risultati:
+        prima via HTTP diretto, poi Playwright se la fonte richiede JS
+        o se la risposta HTTP non supera la validazione.
+        Via Playwright vengono restituiti solo i frammenti dei risultati.
+        """
+        source = adapter.id
+        if settings.SCRAPE_HTTP_FIRST and adapter.fetch_tier == FETCH_HTTP:
+            self.init_http_client()
+            try:
+                response = await self.http_client.get(url)
+                if response.status_code == 200 and adapter.marker in response.text:
+                    stats.update(tier="http", bytes_loaded=len(response.content))
+                    self._count_fetch(source, "http", stats)
+                    return response.text
+                logger.info(f"{source}: HTTP response not usable ({response.status_code}), falling back to browser")
+            except httpx.HTTPError as e:
+                logger.info(f"{source}: HTTP fetch failed ({e}), falling back to browser")
+            self._count_fetch(source, "fallback")
         
+        await self.init_browser()
+        async with self.context_pool.page(source) as (page, budget):
+            try:
+                return await self._render_results(adapter, page, url)
+            finally:
+                stats.update(tier="browser", **budget.to_dict())
+                self._count_fetch(source, "browser", stats)
+    
+    async def _render_results(self, adapter: SourceAdapter, page: Page, url: str) -> str:
+        """Naviga con Playwright e restituisce i soli frammenti dei risultati"""
+        await page.goto(url, wait_until='domcontentloaded', timeout=min(settings.SCRAPE_TIMEOUT, adapter.latency_budget) * 1000)
+        await self._wait_for_results(page, adapter.item_selector)
+        # Solo i contenitori dei risultati: evita di copiare l'intero DOM via CDP
+        fragments = await page.eval_on_selector_all(
+            adapter.item_selector,
+            "(els, limit) => els.slice(0, limit).map(el => el.outerHTML)",
+            adapter.max_items
+        )
+        return "".join(fragments)
+    
+    async def _wait_for_results(self, page: Page, selector: str):
+        """Attende il rendering dei risultati invece di una pausa fissa"""
         try:
-            search_term = barcode if barcode else query
-            url = f"https://www.trovaprezzi.it/prezzi_prodotti.aspx?q={search_term.replace(' ', '+')}"
-            
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await asyncio.sleep(1.5)
-            
-            content = await page.content()
-            soup = BeautifulSoup(content, 'lxml')
-            
-            items = soup.select('.item_prodotto')[:10]
-            
-            for item in items:
-                try:
-                    title_el = item.select_one('.item_prodotto_nome')
-                    if not title_el:
-                        continue
-                    
-                    link_el = title_el.select_one('a')
-                    link = link_el['href'] if link_el else None
-                    
-                    price_el = item.select_one('.item_prodotto_prezzo_offerta')
-                    if price_el:
-                        price_text = price_el.get_text(strip=True)
-                        price_match = re.search(r'[\d.,]+', price_text.replace('.', '').replace(',', '.'))
-                        if price_match:
-                            price = float(price_match.group())
-                        else:
-                            continue
-                    else:
-                        continue
-                    
-                    seller_el = item.select_one('.item_prodotto_negozio')
-                    seller = seller_el.get_text(strip=True) if seller_el else "TrovaPrezzi"
-                    
-                    results.append(PriceComparisonBase(
-                        source="trovaprezzi",
-                        source_url=link,
-                        price=price,
-                        availability=Availability.IN_STOCK,
-                        seller_name=seller
-                    ))
-                    
-                except Exception as e:
-                    logger.debug(f"Error parsing TrovaPrezzi item: {e}")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"TrovaPrezzi scrape failed: {e}")
-        finally:
-            await page.close()
+            await page.wait_for_selector(selector, state='attached', timeout=10000)
+        except PlaywrightTimeout:
+            logger.debug(f"No results selector {selector} on {page.url}")
+    
+    async def _scrape_source(self, adapter: SourceAdapter, query: str, barcode: Optional[str] = None) -> Tuple[List[PriceComparisonBase], dict]:
+        """
+        Engine unico: fetch della pagina di ricerca ed estrazione via adapter
         
-        return results
+        Gli errori vengono propagati: "nessun risultato" e "fonte in errore"
+        restano distinguibili nello ScrapeResult.
+        Il parsing gira nel ParserPool; attesa di rete e parsing sono misurati a parte.
+        """
+        stats: dict = {}
+        start = time.monotonic()
+        content = await self._fetch_html(adapter, adapter.search_url(query, barcode), stats)
+        stats["fetch_ms"] = int((time.monotonic() - start) * 1000)
+        results, parse_seconds = await self.parser.parse(adapter, content)
+        stats["parse_ms"] = round(parse_seconds * 1000, 1)
+        return results, stats
 
 
 # Singleton instance
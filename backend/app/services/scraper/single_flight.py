@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+import time
+
+
+class SingleFlight:
+    """
+    Coalescing delle richieste identiche concorrenti
+    - Il primo chiamante (leader) avvia il lavoro in un task separato
+    - I chiamanti successivi con la stessa chiave attendono lo stesso risultato
+    - La cancellazione di un chiamante non interrompe il lavoro condiviso
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.leaders = 0
+        self.merged = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            return await asyncio.shield(task)
+
+        self.merged += 1
+        start = time.monotonic()
+        try:
+            return await asyncio.shield(task)
+        finally:
+            waited = time.monotonic() - start
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # evita "exception was never retrieved"
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "leaders": self.leaders,
+            "merged": self.merged,
+            "avg_merged_wait_ms": int(self.wait_time / self.merged * 1000) if self.merged else 0,
+            "max_merged_wait_ms": int(self.max_wait * 1000),
+        }
@@ -0,0 +1,300 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, quote_plus, urlsplit
+import re
+import logging
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from ...schemas.schemas import PriceComparisonBase, Availability
+from .interception import InterceptionPolicy
+
+logger = logging.getLogger(__name__)
+
+FETCH_HTTP = "http"  # HTTP diretto, Playwright solo come fallback
+FETCH_BROWSER = "browser"  # richiede JavaScript rendering
+
+_PRICE_RE = re.compile(r'\d+(?:\.\d+)?')
+_AMAZON_FRACTION = soupsieve.compile('.a-price-fraction')
+
+
+@dataclass
+class SourceAdapter:
+    """
+    Descrizione dichiarativa di una fonte di prezzi
+    - URL di ricerca (`{term}` viene sostituito con la query)
+    - Selettori CSS per contenitore risultati, titolo, link, prezzo
+    - Attributi del contenitore per il parsing parziale (SoupStrainer)
+    - Parser del prezzo, tier di fetch e budget di latenza (secondi)
+    - Politica di intercettazione richieste per il rendering via browser
+    """
+    id: str
+    name: str
+    description: str
+    reliability: str
+    url_template: str
+    item_selector: str
+    title_selector: str
+    link_selector: str
+    price_selector: str
+    marker: str  # stringa attesa nell'HTML statico valido
+    container_attrs: Optional[Dict[str, str]] = None  # es. {"class": "productCard"}
+    fetch_tier: str = FETCH_HTTP
+    quote_space_as_plus: bool = True
+    link_prefix: str = ""
+    seller_name: Optional[str] = None
+    seller_selector: Optional[str] = None
+    availability_selector: Optional[str] = None
+    shipping_selector: Optional[str] = None
+    price_parser: Optional[Callable[[Tag, "SourceAdapter"], Optional[float]]] = None
+    max_items: int = 10
+    latency_budget: float = 10.0
+    first_party_hosts: Tuple[str, ...] = ()  # default: dominio dell'URL di ricerca
+    page_byte_budget: int = 3 * 1024 * 1024
+    page_time_budget: float = 15.0  # secondi di caricamento risorse per pagina
+    interception: Optional[InterceptionPolicy] = field(default=None, init=False, repr=False)
+    _compiled: Dict[str, soupsieve.SoupSieve] = field(default_factory=dict, init=False, repr=False)
+    strainer: Optional[SoupStrainer] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        selectors = {
+            "item": self.item_selector,
+            "title": self.title_selector,
+            "link": self.link_selector,
+            "price": self.price_selector,
+            "seller": self.seller_selector,
+            "availability": self.availability_selector,
+            "shipping": self.shipping_selector,
+        }
+        self._compiled = {
+            name: soupsieve.compile(selector)
+            for name, selector in selectors.items() if selector
+        }
+        if self.price_parser is None:
+            self.price_parser = parse_price_text
+        if not self.first_party_hosts:
+            host = urlsplit(self.url_template).hostname or ""
+            self.first_party_hosts = (host[4:] if host.startswith("www.") else host,)
+        self.interception = InterceptionPolicy(
+            first_party_hosts=self.first_party_hosts,
+            byte_budget=self.page_byte_budget,
+            time_budget=self.page_time_budget
+        )
+        if self.container_attrs:
+            self.strainer = SoupStrainer(attrs={
+                name: _token_matcher(value) if name == "class" else value
+                for name, value in self.container_attrs.items()
+            })
+
+    def search_url(self, query: str, barcode: Optional[str] = None) -> str:
+        term = barcode if barcode else query
+        encoded = quote_plus(term) if self.quote_space_as_plus else quote(term)
+        return self.url_template.format(term=encoded)
+
+    def select(self, root: Tag, name: str) -> List[Tag]:
+        return self._compiled[name].select(root, limit=self.max_items)
+
+    def select_one(self, root: Tag, name: str) -> Optional[Tag]:
+        selector = self._compiled.get(name)
+        return selector.select_one(root) if selector else None
+
+    def describe(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "reliability": self.reliability,
+            "fetch_tier": self.fetch_tier,
+            "latency_budget_s": self.latency_budget,
+        }
+
+
+def _token_matcher(token: str) -> Callable[[Optional[str]], bool]:
+    """In fase di parsing `class` arriva come stringa unica: confronta i singoli token"""
+    def match(value) -> bool:
+        if not value:
+            return False
+        tokens = value.split() if isinstance(value, str) else value
+        return token in tokens
+    return match
+
+
+# === PARSER PREZZI ===
+
+def parse_price_text(item: Tag, adapter: SourceAdapter) -> Optional[float]:
+    """Prezzo in formato italiano (es. '€ 1.299,00')"""
+    price_el = adapter.select_one(item, "price")
+    if not price_el:
+        return None
+    price_text = price_el.get_text(strip=True).replace('.', '').replace(',', '.')
+    price_match = _PRICE_RE.search(price_text)
+    return float(price_match.group()) if price_match else None
+
+
+def parse_amazon_price(item: Tag, adapter: SourceAdapter) -> Optional[float]:
+    """Prezzo Amazon diviso in parte intera e frazione"""
+    price_whole = adapter.select_one(item, "price")
+    if not price_whole:
+        return None
+    price_frac = _AMAZON_FRACTION.select_one(item)
+    price_str = price_whole.get_text(strip=True).replace('.', '').replace(',', '')
+    frac = price_frac.get_text(strip=True) if price_frac else '00'
+    return float(f"{price_str}.{frac}")
+
+
+# === ENGINE DI ESTRAZIONE ===
+
+def parse_listing(adapter: SourceAdapter, html: str) -> List[PriceComparisonBase]:
+    """
+    Estrae i risultati da una pagina di ricerca secondo l'adapter
+
+    Con `container_attrs` l'albero viene costruito solo per i contenitori
+    dei risultati (il resto della pagina viene scartato in fase di parsing).
+    `html` può essere la pagina intera o i soli frammenti dei risultati.
+    """
+    soup = BeautifulSoup(html, 'lxml', parse_only=adapter.strainer)
+    results = []
+
+    for item in adapter.select(soup, "item"):
+        try:
+            if not adapter.select_one(item, "title"):
+                continue
+
+            price = adapter.price_parser(item, adapter)
+            if price is None:
+                continue
+
+            link_el = adapter.select_one(item, "link")
+            link = f"{adapter.link_prefix}{link_el['href']}" if link_el and link_el.get('href') else None
+
+            if adapter.availability_selector:
+                availability = Availability.IN_STOCK if adapter.select_one(item, "availability") else Availability.UNKNOWN
+            else:
+                availability = Availability.IN_STOCK
+
+            shipping_el = adapter.select_one(item, "shipping")
+            seller_el = adapter.select_one(item, "seller")
+
+            results.append(PriceComparisonBase(
+                source=adapter.id,
+                source_url=link,
+                price=price,
+                availability=availability,
+                shipping_time=shipping_el.get_text(strip=True) if shipping_el else None,
+                seller_name=seller_el.get_text(strip=True) if seller_el else adapter.seller_name
+            ))
+
+        except Exception as e:
+            logger.debug(f"Error parsing {adapter.name} item: {e}")
+            continue
+
+    return results
+
+
+# === REGISTRY ===
+
+SOURCE_REGISTRY: Dict[str, SourceAdapter] = {}
+
+
+def register_source(adapter: SourceAdapter) -> SourceAdapter:
+    """Registra (o sostituisce) una fonte"""
+    SOURCE_REGISTRY[adapter.id] = adapter
+    return adapter
+
+
+def get_source(source_id: str) -> Optional[SourceAdapter]:
+    return SOURCE_REGISTRY.get(source_id)
+
+
+def list_sources() -> List[SourceAdapter]:
+    return list(SOURCE_REGISTRY.values())
+
+
+register_source(SourceAdapter(
+    id="amazon",
+    name="Amazon.it",
+    description="Marketplace principale",
+    reliability="alta",
+    url_template="https://www.amazon.it/s?k={term}",
+    item_selector='[data-component-type="s-search-result"]',
+    title_selector='h2 a span',
+    link_selector='h2 a',
+    price_selector='.a-price-whole',
+    price_parser=parse_amazon_price,
+    marker='s-search-result',
+    container_attrs={"data-component-type": "s-search-result"},
+    first_party_hosts=("amazon.it", "media-amazon.com"),
+    link_prefix="https://www.amazon.it",
+    seller_name="Amazon",
+    availability_selector='.a-color-success',
+    shipping_selector='[data-cy="delivery-recipe"]',
+))
+
+register_source(SourceAdapter(
+    id="eprice",
+    name="ePRICE",
+    description="Elettronica e tech",
+    reliability="alta",
+    url_template="https://www.eprice.it/s/?k={term}",
+    quote_space_as_plus=False,
+    item_selector='.productCard',
+    title_selector='.productCard__title',
+    link_selector='a.productCard__link',
+    price_selector='.productCard__price',
+    marker='productCard',
+    container_attrs={"class": "productCard"},
+    seller_name="ePRICE",
+))
+
+register_source(SourceAdapter(
+    id="unieuro",
+    name="Unieuro",
+    description="Elettronica consumer",
+    reliability="media",
+    url_template="https://www.unieuro.it/online/ricerca?q={term}",
+    item_selector='.product-card',
+    title_selector='.product-card__title',
+    link_selector='a',
+    price_selector='.product-card__price',
+    marker='product-card',
+    container_attrs={"class": "product-card"},
+    fetch_tier=FETCH_BROWSER,
+    latency_budget=15.0,
+    link_prefix="https://www.unieuro.it",
+    seller_name="Unieuro",
+))
+
+register_source(SourceAdapter(
+    id="mediaworld",
+    name="MediaWorld",
+    description="Elettronica e elettrodomestici",
+    reliability="media",
+    url_template="https://www.mediaworld.it/search?query={term}",
+    quote_space_as_plus=False,
+    item_selector='[data-test="mms-product-card"]',
+    title_selector='[data-test="product-title"]',
+    link_selector='a',
+    price_selector='[data-test="product-price"]',
+    marker='mms-product-card',
+    container_attrs={"data-test": "mms-product-card"},
+    fetch_tier=FETCH_BROWSER,
+    latency_budget=15.0,
+    first_party_hosts=("mediaworld.it", "mmsrg.com"),
+    link_prefix="https://www.mediaworld.it",
+    seller_name="MediaWorld",
+))
+
+register_source(SourceAdapter(
+    id="trovaprezzi",
+    name="TrovaPrezzi",
+    description="Aggregatore multi-shop",
+    reliability="alta",
+    url_template="https://www.trovaprezzi.it/prezzi_prodotti.aspx?q={term}",
+    item_selector='.item_prodotto',
+    title_selector='.item_prodotto_nome',
+    link_selector='.item_prodotto_nome a',
+    price_selector='.item_prodotto_prezzo_offerta',
+    marker='item_prodotto',
+    container_attrs={"class": "item_prodotto"},
+    seller_name="TrovaPrezzi",
+    seller_selector='.item_prodotto_negozio',
+))
@@ -0,0 +1,236 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+import itertools
+import logging
+from ...core.config import settings
+from ...schemas.schemas import PriceComparisonBase
+
+logger = logging.getLogger(__name__)
+
+_SHUTDOWN = None
+
+
+# === LATO WORKER ===
+
+def _worker_main(job_queue, result_queue, concurrency: int):
+    """Entry point del processo worker: un event loop e un browser propri"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(_worker_loop(job_queue, result_queue, concurrency))
+
+
+async def _worker_loop(job_queue, result_queue, concurrency: int):
+    from .scraper_service import scraper_service
+    from .sources import get_source
+    from .parser_pool import PARSE_THREAD, ParserPool
+
+    # Il worker è già un processo dedicato: i core sono coperti dal numero di worker,
+    # un pool di processi di parsing per ciascuno moltiplicherebbe i processi
+    scraper_service.parser = ParserPool(mode=PARSE_THREAD, workers=settings.SCRAPE_PARSE_WORKERS)
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    running: Set[asyncio.Task] = set()
+
+    async def run(job_id: int, source: str, query: str, barcode: Optional[str], timeout: float):
+        async with semaphore:
+            try:
+                adapter = get_source(source)
+                if adapter is None:
+                    raise ValueError(f"Fonte sconosciuta: {source}")
+                results, stats = await asyncio.wait_for(
+                    scraper_service._scrape_source(adapter, query, barcode), timeout=timeout
+                )
+                result_queue.put((job_id, True, [r.model_dump(mode="json") for r in results], stats))
+            except asyncio.TimeoutError:
+                result_queue.put((job_id, False, f"{source} over latency budget ({timeout}s)", None))
+            except Exception as e:
+                result_queue.put((job_id, False, str(e) or type(e).__name__, None))
+
+    try:
+        while True:
+            job = await loop.run_in_executor(None, job_queue.get)
+            if job is _SHUTDOWN:
+                break
+            task = asyncio.create_task(run(*job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    finally:
+        await scraper_service.close()
+
+
+# === LATO API ===
+
+@dataclass
+class _Worker:
+    index: int
+    process: multiprocessing.Process
+    jobs: "multiprocessing.Queue"
+    pending: Set[int] = field(default_factory=set)
+    completed: int = 0
+
+
+class ScraperWorkerPool:
+    """
+    Pool di processi worker per lo scraping, separato dall'event loop dell'API
+    - Ogni worker possiede browser, context pool e client HTTP propri
+    - Più scraping concorrenti per worker (asyncio nel worker)
+    - I job vanno al worker meno carico; i risultati tornano su una coda condivisa
+    - Un worker morto viene riavviato e i suoi job in corso falliscono subito
+    """
+
+    def __init__(self, workers: int, concurrency: int):
+        self.size = max(1, workers)
+        self.concurrency = max(1, concurrency)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._results = None
+        self._futures: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._job_ids = itertools.count(1)
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running = False
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        # loop dell'API: worker e job in corso si toccano solo da qui, mai dal thread lettore
+        self._loop = asyncio.get_running_loop()
+        self._results = self._ctx.Queue()
+        self._workers = [self._spawn(i) for i in range(self.size)]
+        self._running = True
+        self._reader = threading.Thread(target=self._read_results, name="scraper-results", daemon=True)
+        self._reader.start()
+        logger.info(f"Scraper worker pool started ({self.size} workers x {self.concurrency})")
+
+    def _spawn(self, index: int) -> _Worker:
+        jobs = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(jobs, self._results, self.concurrency),
+            name=f"scraper-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return _Worker(index=index, process=process, jobs=jobs)
+
+    def _fail_dead(self):
+        """Fa fallire subito i job in corso sui worker terminati (sul loop dell'API)"""
+        for worker in list(self._workers):
+            if not worker.process.is_alive():
+                for job_id in list(worker.pending):
+                    self._resolve(job_id, False, "worker terminato", None)
+
+    def _check_workers(self):
+        """Riavvia i worker terminati"""
+        for i, worker in enumerate(self._workers):
+            if worker.process.is_alive():
+                continue
+            logger.error(f"Scraper worker {worker.index} died (exit {worker.process.exitcode}), restarting")
+            for job_id in list(worker.pending):
+                self._resolve(job_id, False, "worker terminato", None)
+            self._workers[i] = self._spawn(worker.index)
+            self.restarts += 1
+
+    async def submit(
+        self,
+        source: str,
+        query: str,
+        barcode: Optional[str],
+        timeout: float
+    ) -> Tuple[List[PriceComparisonBase], dict]:
+        """Esegue lo scraping di una fonte su un worker"""
+        if not self._running:
+            raise RuntimeError("Scraper worker pool non avviato")
+
+        self._check_workers()
+        worker = min(self._workers, key=lambda w: len(w.pending))
+        job_id = next(self._job_ids)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[job_id] = (loop, future)
+        worker.pending.add(job_id)
+        worker.jobs.put((job_id, source, query, barcode, timeout))
+
+        try:
+            ok, payload, stats = await future
+        finally:
+            self._futures.pop(job_id, None)
+            worker.pending.discard(job_id)
+        worker.completed += 1
+
+        if not ok:
+            raise RuntimeError(payload)
+        return [PriceComparisonBase(**r) for r in payload], stats or {}
+
+    def _read_results(self):
+        while self._running:
+            try:
+                job_id, ok, payload, stats = self._results.get(timeout=0.5)
+            except queue.Empty:
+                try:
+                    self._loop.call_soon_threadsafe(self._fail_dead)
+                except RuntimeError:  # loop chiuso
+                    break
+                continue
+            except (EOFError, OSError, ValueError):
+                break
+            self._resolve(job_id, ok, payload, stats)
+
+    def _resolve(self, job_id: int, ok: bool, payload, stats):
+        entry = self._futures.get(job_id)
+        if entry is None:
+            return  # chiamante già andato via (timeout/cancellazione)
+        loop, future = entry
+
+        def set_result():
+            if not future.done():
+                future.set_result((ok, payload, stats))
+
+        loop.call_soon_threadsafe(set_result)
+
+    async def close(self):
+        if not self._running:
+            return
+        for worker in self._workers:
+            worker.jobs.put(_SHUTDOWN)
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            await loop.run_in_executor(None, worker.process.join, 10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._running = False
+        if self._reader:
+            await loop.run_in_executor(None, self._reader.join, 2)
+        self._workers = []
+        logger.info("Scraper worker pool stopped")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "concurrency_per_worker": self.concurrency,
+            "restarts": self.restarts,
+            "pool": [
+                {
+                    "index": w.index,
+                    "pid": w.process.pid,
+                    "alive": w.process.is_alive(),
+                    "in_flight": len(w.pending),
+                    "completed": w.completed,
+                }
+                for w in self._workers
+            ]
+        }
@@ -0,0 +1,675 @@
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+import numpy as np
+from ...core.config import settings
+from ...schemas.schemas import Availability
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+AVAILABILITY_CODES = [a.value for a in Availability]
+
+# Soglia di variazione sul periodo (rispetto alla media) per parlare di trend
+TREND_THRESHOLD = 0.01
+
+RESOLUTION_RAW = "raw"
+RESOLUTION_DAY = "day"
+RESOLUTION_WEEK = "week"
+DAY = 86400
+WEEK = 7 * DAY
+_MONDAY_OFFSET = 4 * DAY  # 1970-01-01 era un giovedì
+
+# Layout su disco: <dir>/<sha1 prodotto>/<YYYY-MM>.npz + checked.json
+PARTITION_SUFFIX = ".npz"
+CHECKED_FILE = "checked.json"
+WRITER_LOCK = ".writer.lock"
+
+
+def to_epoch(value: datetime) -> int:
+    """Secondi UTC; i datetime naive sono considerati già in UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - _EPOCH).total_seconds())
+
+
+def _month(ts: int) -> str:
+    return (_EPOCH + timedelta(seconds=ts)).strftime("%Y-%m")
+
+
+@dataclass
+class PricePoint:
+    recorded_at: datetime
+    price: float
+    availability: str
+
+
+class _Partition:
+    """
+    Un mese di punti di un prodotto, in colonne
+    - aperta: array append-only
+    - sigillata: timestamp delta-encoded + colonne compresse con zlib
+    """
+
+    __slots__ = ("ts", "source", "cents", "availability", "sealed", "count")
+
+    def __init__(self):
+        self.ts = array("q")
+        self.source = array("H")
+        self.cents = array("i")
+        self.availability = array("B")
+        self.sealed: Optional[dict] = None
+        self.count = 0
+
+    def append(self, ts: int, source: int, cents: int, availability: int):
+        if self.sealed is not None:
+            # punto tardivo in un mese già chiuso (es. un'altra fonte ha già aperto
+            # il mese successivo): riapre, aggiunge e richiude
+            self._reopen()
+            self._append(ts, source, cents, availability)
+            self.seal()
+            return
+        self._append(ts, source, cents, availability)
+
+    def _append(self, ts: int, source: int, cents: int, availability: int):
+        self.ts.append(ts)
+        self.source.append(source)
+        self.cents.append(cents)
+        self.availability.append(availability)
+        self.count += 1
+
+    def seal(self):
+        if self.sealed is not None or not self.count:
+            return
+        ts = np.frombuffer(self.ts, dtype=np.int64).copy()
+        deltas = np.diff(ts, prepend=ts[:1]).astype(np.int32)
+        self.sealed = {
+            "ts0": int(ts[0]),
+            "ts": zlib.compress(deltas.tobytes()),
+            "source": zlib.compress(self.source.tobytes()),
+            "cents": zlib.compress(self.cents.tobytes()),
+            "availability": zlib.compress(self.availability.tobytes()),
+        }
+        self.ts, self.source, self.cents, self.availability = array("q"), array("H"), array("i"), array("B")
+
+    def _reopen(self):
+        ts, source, cents, availability = self.columns()
+        self.ts, self.source, self.cents, self.availability = array("q"), array("H"), array("i"), array("B")
+        self.ts.frombytes(ts.astype(np.int64).tobytes())
+        self.source.frombytes(source.tobytes())
+        self.cents.frombytes(cents.tobytes())
+        self.availability.frombytes(availability.tobytes())
+        self.sealed = None
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(ts, source, cents, availability) come array numpy"""
+        if self.sealed is None:
+            return (
+                np.frombuffer(self.ts, dtype=np.int64).copy(),
+                np.frombuffer(self.source, dtype=np.uint16).copy(),
+                np.frombuffer(self.cents, dtype=np.int32).copy(),
+                np.frombuffer(self.availability, dtype=np.uint8).copy(),
+            )
+        deltas = np.frombuffer(zlib.decompress(self.sealed["ts"]), dtype=np.int32)
+        return (
+            self.sealed["ts0"] + np.cumsum(deltas, dtype=np.int64),
+            np.frombuffer(zlib.decompress(self.sealed["source"]), dtype=np.uint16),
+            np.frombuffer(zlib.decompress(self.sealed["cents"]), dtype=np.int32),
+            np.frombuffer(zlib.decompress(self.sealed["availability"]), dtype=np.uint8),
+        )
+
+    def stored_bytes(self) -> int:
+        if self.sealed is None:
+            return self.count * (8 + 2 + 4 + 1)
+        return 8 + sum(len(v) for k, v in self.sealed.items() if k != "ts0")
+
+
+def bucket_start(ts: int, resolution: str) -> int:
+    if resolution == RESOLUTION_WEEK:
+        return (ts - _MONDAY_OFFSET) // WEEK * WEEK + _MONDAY_OFFSET
+    return ts // DAY * DAY
+
+
+class _Rollup:
+    """Aggregati per bucket (giorno o settimana) di una serie prodotto/fonte"""
+
+    __slots__ = ("starts", "buckets")
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.buckets: Dict[int, List[float]] = {}  # start -> [min, max, sum, count, last]
+
+    def add(self, start: int, price: float):
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            # le serie sono append-only in ordine di tempo: di norma è un append
+            if self.starts and start < self.starts[-1]:
+                self.starts.insert(bisect_left(self.starts, start), start)
+            else:
+                self.starts.append(start)
+            self.buckets[start] = [price, price, price, 1, price]
+            return
+        bucket[0] = min(bucket[0], price)
+        bucket[1] = max(bucket[1], price)
+        bucket[2] += price
+        bucket[3] += 1
+        bucket[4] = price
+
+    def window(self, first: int, last: int, step: int) -> List[Tuple[int, float, float, float, float, int]]:
+        """
+        (start, min, max, avg, last, count) per ogni bucket in [first, last];
+        i bucket senza variazioni riportano il prezzo in vigore (count 0)
+        """
+        index = bisect_left(self.starts, first)
+        carry = self.buckets[self.starts[index - 1]][4] if index > 0 else None
+        rows = []
+        start = first
+        while start <= last:
+            bucket = self.buckets.get(start)
+            if bucket is not None:
+                low, high, total, count, close = bucket
+                rows.append((start, low, high, total / count, close, count))
+                carry = close
+            elif carry is not None:
+                rows.append((start, carry, carry, carry, carry, 0))
+            start += step
+        return rows
+
+
+def price_stats(
+    ts: np.ndarray,
+    prices: np.ndarray,
+    sources: Optional[np.ndarray] = None,
+    now: Optional[int] = None
+) -> dict:
+    """
+    Statistiche vettoriali su una serie di punti di variazione
+    - media pesata sul tempo: ogni prezzo vale fino al punto successivo della stessa fonte
+    - current_price: miglior ultimo prezzo tra le fonti
+    - trend dalla pendenza della regressione lineare (EUR/giorno)
+    """
+    if prices.size == 0:
+        return {
+            "min_price": None, "max_price": None, "avg_price": None, "current_price": None,
+            "percentiles": None, "trend_slope_per_day": None, "trend": "stable", "points": 0
+        }
+
+    if sources is None:
+        sources = np.zeros(prices.size, dtype=np.uint16)
+    now = max(now or int(time.time()), int(ts.max()))
+
+    order = np.lexsort((ts, sources))
+    ts, prices, sources = ts[order], prices[order], sources[order]
+    last_of_source = np.append(sources[1:] != sources[:-1], True)
+    next_ts = np.where(last_of_source, now, np.roll(ts, -1))
+    durations = (next_ts - ts).astype(np.float64)
+    avg = float(np.average(prices, weights=durations)) if durations.sum() > 0 else float(prices.mean())
+
+    slope = 0.0
+    if ts.max() > ts.min():
+        slope = float(np.polyfit((ts - ts.min()) / 86400.0, prices, 1)[0])
+    span_days = (now - ts.min()) / 86400.0
+    relative_move = slope * span_days / avg if avg else 0.0
+    trend = "down" if relative_move < -TREND_THRESHOLD else "up" if relative_move > TREND_THRESHOLD else "stable"
+
+    p25, p50, p75 = np.percentile(prices, [25, 50, 75])
+    return {
+        "min_price": round(float(prices.min()), 2),
+        "max_price": round(float(prices.max()), 2),
+        "avg_price": round(avg, 2),
+        "current_price": round(float(prices[last_of_source].min()), 2),
+        "percentiles": {"p25": round(float(p25), 2), "p50": round(float(p50), 2), "p75": round(float(p75), 2)},
+        "trend_slope_per_day": round(slope, 4),
+        "trend": trend,
+        "points": int(prices.size),
+    }
+
+
+class PriceHistoryStore:
+    """
+    Storico prezzi reale per prodotto e fonte, in formato colonnare
+    - Partizioni per prodotto e mese; i mesi passati vengono sigillati e compressi
+    - Fonti e disponibilità codificate a dizionario, prezzi in centesimi (int32)
+    - Append-only: un punto viene scritto solo se prezzo o disponibilità cambiano
+      (il prezzo resta valido fino al punto successivo)
+    - `last_checked` registra l'ultima verifica anche quando nulla è cambiato
+    - Persistenza: un file npz per prodotto e mese in `directory`, riscritto solo
+      se la partizione è cambiata; un solo processo scrive (lock sul file),
+      gli altri worker ricaricano i file modificati
+    """
+
+    def __init__(self):
+        self._partitions: Dict[str, Dict[str, _Partition]] = {}
+        self._sources: List[str] = []
+        self._source_codes: Dict[str, int] = {}
+        self._last: Dict[Tuple[str, str], Tuple[int, int, int]] = {}
+        self._last_checked: Dict[Tuple[str, str], datetime] = {}
+        self._rollups: Dict[str, Dict[Tuple[str, int], _Rollup]] = {RESOLUTION_DAY: {}, RESOLUTION_WEEK: {}}
+        self.directory: Optional[str] = None
+        self.writable = False
+        self._lock_file = None
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._checked_dirty: Set[str] = set()
+        self._mtimes: Dict[str, int] = {}
+        self.writes = 0
+        self.skipped = 0
+
+    def _source_code(self, source: str) -> int:
+        code = self._source_codes.get(source)
+        if code is None:
+            code = len(self._sources)
+            self._sources.append(source)
+            self._source_codes[source] = code
+        return code
+
+    def record(
+        self,
+        product_key: str,
+        source: str,
+        price: float,
+        availability: str,
+        recorded_at: datetime
+    ) -> bool:
+        """Registra una rilevazione; True se ha prodotto un nuovo punto"""
+        key = (product_key, source)
+        checked = self._last_checked.get(key)
+        if checked is None or recorded_at > checked:
+            self._last_checked[key] = recorded_at
+            self._checked_dirty.add(product_key)
+
+        ts = to_epoch(recorded_at)
+        cents = int(round(price * 100))
+        availability_code = AVAILABILITY_CODES.index(availability) if availability in AVAILABILITY_CODES else AVAILABILITY_CODES.index("unknown")
+        last = self._last.get(key)
+        if last and (ts <= last[0] or (last[1] == cents and last[2] == availability_code)):
+            self.skipped += 1
+            return False
+
+        month = _month(ts)
+        partitions = self._partitions.setdefault(product_key, {})
+        if month not in partitions:
+            for older_month, partition in partitions.items():
+                if older_month < month and partition.sealed is None:
+                    partition.seal()
+                    self._dirty.add((product_key, older_month))
+            partitions[month] = _Partition()
+        self._dirty.add((product_key, month))
+        source_code = self._source_code(source)
+        partitions[month].append(ts, source_code, cents, availability_code)
+        self._last[key] = (ts, cents, availability_code)
+        for resolution, rollups in self._rollups.items():
+            rollup = rollups.get((product_key, source_code))
+            if rollup is None:
+                rollup = rollups[(product_key, source_code)] = _Rollup()
+            rollup.add(bucket_start(ts, resolution), cents / 100)
+        self.writes += 1
+        return True
+
+    def last(self, product_key: str, source: str) -> Optional[PricePoint]:
+        last = self._last.get((product_key, source))
+        if last is None:
+            return None
+        ts, cents, availability = last
+        return PricePoint(_EPOCH + timedelta(seconds=ts), cents / 100, AVAILABILITY_CODES[availability])
+
+    def has_history(self, product_key: str) -> bool:
+        return product_key in self._partitions
+
+    def columns(
+        self,
+        product_key: str,
+        days: Optional[int] = None,
+        source: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Colonne (ts, source, price, availability) della finestra richiesta, in ordine di tempo.
+        Come per i rollup, il prezzo in vigore a inizio finestra viene riportato:
+        l'ultimo punto precedente di ogni fonte compare con ts = inizio finestra.
+        """
+        since = to_epoch(datetime.utcnow() - timedelta(days=days)) if days is not None else None
+        first_month = _month(since) if since is not None else ""
+        code = self._source_codes.get(source) if source is not None else None
+        # fonti di cui cercare ancora il punto precedente la finestra
+        pending = set()
+        if since is not None:
+            pending = {self._source_codes[s] for k, s in self._last if k == product_key}
+            if source is not None:
+                pending &= {code}
+        parts = []
+        partitions = self._partitions.get(product_key, {})
+        for month in sorted(partitions, reverse=True):
+            partition = partitions[month]
+            if month < first_month and not pending:
+                break
+            if not partition.count:
+                continue
+            part = partition.columns()
+            parts.append(part)
+            if pending:
+                pending -= set(np.unique(part[1][part[0] < since]).tolist())
+        if not parts:
+            empty = np.array([], dtype=np.int64)
+            return {"ts": empty, "source": empty.astype(np.uint16), "price": empty.astype(np.float64), "availability": empty.astype(np.uint8)}
+
+        ts, sources, cents, availability = (np.concatenate(column) for column in zip(*parts))
+        mask = np.ones(ts.size, dtype=bool)
+        if source is not None:
+            mask &= sources == code if code is not None else False
+        if since is not None:
+            before = np.flatnonzero(mask & (ts < since))
+            mask &= ts >= since
+            if before.size:
+                order = before[np.lexsort((ts[before], sources[before]))]
+                seeds = order[np.append(sources[order][1:] != sources[order][:-1], True)]
+                mask[seeds] = True
+                ts[seeds] = since
+
+        order = np.argsort(ts[mask], kind="stable")
+        return {
+            "ts": ts[mask][order],
+            "source": sources[mask][order],
+            "price": cents[mask][order] / 100.0,
+            "availability": availability[mask][order],
+        }
+
+    def history(
+        self,
+        product_key: str,
+        days: int = 90,
+        source: Optional[str] = None
+    ) -> List[dict]:
+        """Punti degli ultimi `days` giorni, ordinati per data"""
+        cols = self.columns(product_key, days=days, source=source)
+        dates = cols["ts"].astype("datetime64[s]").astype(str)
+        return [
+            {
+                "date": date,
+                "source": self._sources[code],
+                "price": round(float(price), 2),
+                "availability": AVAILABILITY_CODES[availability],
+            }
+            for date, code, price, availability in zip(dates, cols["source"], cols["price"], cols["availability"])
+        ]
+
+    def aggregate(
+        self,
+        product_key: str,
+        days: int = 90,
+        source: Optional[str] = None,
+        resolution: str = RESOLUTION_RAW
+    ) -> dict:
+        """min/max/media/percentili/trend sulle colonne o, per risoluzioni aggregate, sui rollup"""
+        if resolution == RESOLUTION_RAW:
+            cols = self.columns(product_key, days=days, source=source)
+            return price_stats(cols["ts"], cols["price"], cols["source"])
+
+        rows = self._rollup_rows(product_key, days, source, resolution)
+        if not rows:
+            return price_stats(np.array([], dtype=np.int64), np.array([]))
+        starts, codes, lows, highs, avgs, closes, counts = (np.array(column) for column in zip(*rows))
+        stats = price_stats(starts, avgs, codes.astype(np.uint16))
+        order = np.lexsort((starts, codes))
+        last_of_source = np.append(codes[order][1:] != codes[order][:-1], True)
+        stats.update(
+            min_price=round(float(lows.min()), 2),
+            max_price=round(float(highs.max()), 2),
+            current_price=round(float(closes[order][last_of_source].min()), 2),
+            points=int(counts.sum()),
+            buckets=len(rows)
+        )
+        return stats
+
+    def _rollup_rows(
+        self,
+        product_key: str,
+        days: int,
+        source: Optional[str],
+        resolution: str
+    ) -> List[Tuple[int, int, float, float, float, float, int]]:
+        step = WEEK if resolution == RESOLUTION_WEEK else DAY
+        now = to_epoch(datetime.utcnow())
+        first = bucket_start(now - days * DAY, resolution)
+        last = bucket_start(now, resolution)
+        codes = [self._source_codes[source]] if source is not None and source in self._source_codes else []
+        if source is None:
+            codes = range(len(self._sources))
+
+        rows = []
+        for code in codes:
+            rollup = self._rollups[resolution].get((product_key, code))
+            if rollup is None:
+                continue
+            rows.extend((start, code, low, high, avg, close, count) for start, low, high, avg, close, count in rollup.window(first, last, step))
+        rows.sort(key=lambda row: (row[0], row[1]))
+        return rows
+
+    def rollup(
+        self,
+        product_key: str,
+        resolution: str,
+        days: int = 365,
+        source: Optional[str] = None
+    ) -> List[dict]:
+        """Serie aggregata per giorno/settimana: O(bucket) invece di O(punti)"""
+        return [
+            {
+                "date": (_EPOCH + timedelta(seconds=start)).isoformat(),
+                "source": self._sources[code],
+                "min": round(low, 2),
+                "max": round(high, 2),
+                "avg": round(avg, 2),
+                "last": round(close, 2),
+                "count": count,
+            }
+            for start, code, low, high, avg, close, count in self._rollup_rows(product_key, days, source, resolution)
+        ]
+
+    def last_checked(self, product_key: str) -> Dict[str, str]:
+        return {
+            source: checked.isoformat()
+            for (key, source), checked in self._last_checked.items()
+            if key == product_key
+        }
+
+    # === PERSISTENZA ===
+
+    def open(self, directory: str) -> bool:
+        """Carica lo storico da `directory` e prova a diventarne l'unico scrittore"""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.load()
+        return self.acquire()
+
+    def acquire(self) -> bool:
+        """
+        Lock di scrittura (flock non bloccante): con più worker uvicorn uno solo
+        scrive, gli altri lo rilevano alla sua uscita. True se questo processo scrive.
+        """
+        if self.directory is None:
+            return True  # solo in memoria
+        if self.writable:
+            return True
+        lock_file = open(os.path.join(self.directory, WRITER_LOCK), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.writable = True
+        # quanto scritto dal vecchio scrittore fino al rilascio del lock
+        self.load()
+        logger.info(f"Price history writer: {self.directory}")
+        return True
+
+    def close(self):
+        self.flush()
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+        self.writable = False
+
+    def _product_dir(self, product_key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(product_key.encode()).hexdigest())
+
+    def _write(self, path: str, write):
+        """Scrittura atomica (file temporaneo + rename): chi legge non vede mai file parziali"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+        self._mtimes[path] = os.stat(path).st_mtime_ns
+
+    def flush(self) -> int:
+        """Scrive su disco partizioni e ultime verifiche modificate; restituisce i file scritti"""
+        if not self.writable:
+            return 0
+        written = 0
+        for product_key, month in sorted(self._dirty):
+            partition = self._partitions[product_key][month]
+            ts, sources, cents, availability = partition.columns()
+            product_dir = self._product_dir(product_key)
+            os.makedirs(product_dir, exist_ok=True)
+            self._write(
+                os.path.join(product_dir, month + PARTITION_SUFFIX),
+                lambda f: np.savez_compressed(
+                    f,
+                    product=np.array(product_key),
+                    sources=np.array(self._sources),
+                    ts=ts,
+                    source=sources,
+                    cents=cents,
+                    availability=availability,
+                    sealed=np.array(partition.sealed is not None)
+                )
+            )
+            written += 1
+        for product_key in sorted(self._checked_dirty):
+            checked = {
+                source: value.isoformat()
+                for (key, source), value in self._last_checked.items()
+                if key == product_key
+            }
+            product_dir = self._product_dir(product_key)
+            os.makedirs(product_dir, exist_ok=True)
+            self._write(
+                os.path.join(product_dir, CHECKED_FILE),
+                lambda f: f.write(json.dumps({"product": product_key, "checked": checked}).encode())
+            )
+            written += 1
+        self._dirty.clear()
+        self._checked_dirty.clear()
+        return written
+
+    def load(self) -> int:
+        """Carica i file nuovi o modificati da un altro processo; restituisce i file letti"""
+        if self.directory is None or not os.path.isdir(self.directory):
+            return 0
+        loaded = 0
+        changed: Set[str] = set()
+        for product_dir in os.scandir(self.directory):
+            if not product_dir.is_dir():
+                continue
+            for entry in os.scandir(product_dir.path):
+                if not (entry.name.endswith(PARTITION_SUFFIX) or entry.name == CHECKED_FILE):
+                    continue
+                mtime = entry.stat().st_mtime_ns
+                if self._mtimes.get(entry.path) == mtime:
+                    continue
+                try:
+                    if entry.name == CHECKED_FILE:
+                        self._load_checked(entry.path)
+                    else:
+                        changed.add(self._load_partition(entry.path, entry.name[:-len(PARTITION_SUFFIX)]))
+                except (OSError, ValueError, KeyError, zlib.error) as e:
+                    logger.warning(f"Skipping unreadable history file {entry.path}: {e}")
+                    continue
+                self._mtimes[entry.path] = mtime
+                loaded += 1
+        for product_key in changed:
+            self._reindex(product_key)
+        return loaded
+
+    def _load_partition(self, path: str, month: str) -> str:
+        with np.load(path) as data:
+            product_key = str(data["product"])
+            names = [str(name) for name in data["sources"]]
+            codes = np.array([self._source_code(name) for name in names], dtype=np.uint16)
+            partition = _Partition()
+            partition.ts.frombytes(data["ts"].astype(np.int64).tobytes())
+            partition.source.frombytes(codes[data["source"]].tobytes())
+            partition.cents.frombytes(data["cents"].astype(np.int32).tobytes())
+            partition.availability.frombytes(data["availability"].astype(np.uint8).tobytes())
+            partition.count = len(partition.ts)
+            if bool(data["sealed"]):
+                partition.seal()
+        self._partitions.setdefault(product_key, {})[month] = partition
+        return product_key
+
+    def _load_checked(self, path: str):
+        with open(path) as f:
+            data = json.load(f)
+        for source, value in data["checked"].items():
+            self._last_checked[(data["product"], source)] = datetime.fromisoformat(value)
+
+    def _reindex(self, product_key: str):
+        """Ricostruisce ultimo punto e rollup di un prodotto dalle sue partizioni"""
+        for key in [key for key in self._last if key[0] == product_key]:
+            del self._last[key]
+        for rollups in self._rollups.values():
+            for key in [key for key in rollups if key[0] == product_key]:
+                del rollups[key]
+        cols = self.columns(product_key)
+        cents = np.rint(cols["price"] * 100).astype(np.int64)
+        for ts, code, value, availability in zip(cols["ts"].tolist(), cols["source"].tolist(), cents.tolist(), cols["availability"].tolist()):
+            self._last[(product_key, self._sources[code])] = (ts, value, availability)
+            for resolution, rollups in self._rollups.items():
+                rollup = rollups.get((product_key, code))
+                if rollup is None:
+                    rollup = rollups[(product_key, code)] = _Rollup()
+                rollup.add(bucket_start(ts, resolution), value / 100)
+
+    def stats(self) -> dict:
+        partitions = [p for product in self._partitions.values() for p in product.values()]
+        points = sum(p.count for p in partitions)
+        return {
+            "products": len(self._partitions),
+            "series": len(self._last),
+            "points": points,
+            "partitions": len(partitions),
+            "sealed_partitions": sum(1 for p in partitions if p.sealed is not None),
+            "stored_bytes": sum(p.stored_bytes() for p in partitions),
+            "raw_bytes": points * (8 + 2 + 4 + 1),
+            "rollup_buckets": {
+                resolution: sum(len(r.buckets) for r in rollups.values())
+                for resolution, rollups in self._rollups.items()
+            },
+            "writes": self.writes,
+            "unchanged_skipped": self.skipped,
+            "directory": self.directory,
+            "writer": self.writable,
+            "unflushed_partitions": len(self._dirty),
+        }
+
+
+def choose_resolution(days: int) -> str:
+    """La risoluzione più grossolana adeguata alla finestra richiesta"""
+    if days <= settings.HISTORY_RAW_MAX_DAYS:
+        return RESOLUTION_RAW
+    if days <= settings.HISTORY_DAILY_MAX_DAYS:
+        return RESOLUTION_DAY
+    return RESOLUTION_WEEK
+
+
+# Singleton instance
+price_history_store = PriceHistoryStore()
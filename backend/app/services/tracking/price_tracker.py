@@ -0,0 +1,401 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import fcntl
+import json
+import os
+import time
+import logging
+from ...core.config import settings
+from ..scraper.result_cache import normalize_query
+from ..scraper.scraper_service import scraper_service
+from ..scraper.sources import get_source, list_sources
+from .history_store import PriceHistoryStore, price_history_store
+
+logger = logging.getLogger(__name__)
+
+# Peso della volatilità sull'intervallo: una variazione media del 5% lo dimezza
+VOLATILITY_WEIGHT = 20.0
+# Smoothing esponenziale della volatilità (variazione relativa per refresh)
+VOLATILITY_ALPHA = 0.3
+MAX_ERROR_BACKOFF = 3
+# Campi di una voce della watchlist decisi dall'utente (il resto è stato di scheduling)
+WATCH_DEFINITION = ("query", "sources", "base_interval")
+
+
+@dataclass
+class WatchItem:
+    key: str
+    query: str
+    barcode: Optional[str]
+    sources: Optional[List[str]]
+    base_interval: float
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    last_checked: Optional[float] = None
+    last_prices: Dict[str, float] = field(default_factory=dict)
+    volatility: float = 0.0
+    checks: int = 0
+    changes: int = 0
+    consecutive_errors: int = 0
+
+    def interval(self, min_interval: float, max_interval: float) -> float:
+        interval = self.base_interval / (1 + VOLATILITY_WEIGHT * self.volatility)
+        interval *= 2 ** min(self.consecutive_errors, MAX_ERROR_BACKOFF)
+        return min(max_interval, max(min_interval, interval))
+
+    def staleness(self, now: float, min_interval: float, max_interval: float) -> float:
+        """Frazione dell'intervallo trascorsa dall'ultimo controllo (>= 1: da aggiornare)"""
+        if self.last_checked is None:
+            return float("inf")
+        return (now - self.last_checked) / self.interval(min_interval, max_interval)
+
+    def to_dict(self, min_interval: float, max_interval: float) -> dict:
+        now = time.monotonic()
+        next_in = None
+        if self.last_checked is not None:
+            next_in = max(0.0, self.last_checked + self.interval(min_interval, max_interval) - now)
+        return {
+            "key": self.key,
+            "query": self.query,
+            "barcode": self.barcode,
+            "sources": self.sources,
+            "created_at": self.created_at,
+            "interval_s": int(self.interval(min_interval, max_interval)),
+            "next_check_in_s": int(next_in) if next_in is not None else 0,
+            "volatility": round(self.volatility, 4),
+            "last_prices": self.last_prices,
+            "checks": self.checks,
+            "changes": self.changes,
+            "consecutive_errors": self.consecutive_errors,
+        }
+
+    def dump(self) -> dict:
+        """Stato persistente; last_checked (monotonic) diventa un timestamp epoch"""
+        last_checked = None
+        if self.last_checked is not None:
+            last_checked = time.time() - (time.monotonic() - self.last_checked)
+        return {
+            "key": self.key,
+            "query": self.query,
+            "barcode": self.barcode,
+            "sources": self.sources,
+            "base_interval": self.base_interval,
+            "created_at": self.created_at.isoformat(),
+            "last_checked": last_checked,
+            "last_prices": self.last_prices,
+            "volatility": self.volatility,
+            "checks": self.checks,
+            "changes": self.changes,
+            "consecutive_errors": self.consecutive_errors,
+        }
+
+    @classmethod
+    def restore(cls, data: dict) -> "WatchItem":
+        last_checked = data.get("last_checked")
+        if last_checked is not None:
+            last_checked = time.monotonic() - max(0.0, time.time() - last_checked)
+        return cls(
+            key=data["key"],
+            query=data["query"],
+            barcode=data.get("barcode"),
+            sources=data.get("sources"),
+            base_interval=data["base_interval"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            last_checked=last_checked,
+            last_prices=data.get("last_prices") or {},
+            volatility=data.get("volatility", 0.0),
+            checks=data.get("checks", 0),
+            changes=data.get("changes", 0),
+            consecutive_errors=data.get("consecutive_errors", 0),
+        )
+
+
+class PriceTracker:
+    """
+    Scheduler di aggiornamento prezzi per i prodotti osservati
+    - Priorità: staleness (tempo dall'ultimo controllo / intervallo) pesata
+      per la volatilità; i prodotti volatili hanno intervalli più brevi
+    - Rispetta il budget per fonte: interroga solo le fonti con capacità
+      libera nel governatore e con circuito chiuso (il traffico interattivo
+      ha la precedenza); le altre vengono rimandate al giro successivo
+    - Scrive nello storico solo i prezzi cambiati
+    - Watchlist condivisa tra i worker in un file JSON (read-modify-write sotto
+      lock); schedula solo il worker che scrive lo storico
+    """
+
+    def __init__(
+        self,
+        store: PriceHistoryStore,
+        tick: float,
+        default_interval: float,
+        min_interval: float,
+        max_interval: float,
+        batch_size: int
+    ):
+        self.store = store
+        self.tick = tick
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch_size = max(1, batch_size)
+        self.watchlist: Dict[str, WatchItem] = {}
+        self.path: Optional[str] = None
+        self.scheduling = False
+        self._mtime: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.refreshes = 0
+        self.deferred = 0
+
+    # === PERSISTENZA ===
+
+    def open(self, path: str):
+        """Carica la watchlist salvata in `path` (all'avvio, prima dello scheduler)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        loaded = self._read_if_changed(None)
+        if loaded is not None:
+            self._apply(*loaded)
+
+    async def load(self) -> bool:
+        """Rilegge il file se modificato da un altro worker; True se ricaricato"""
+        if self.path is None:
+            return False
+        loaded = await asyncio.to_thread(self._read_if_changed, self._mtime)
+        if loaded is None:
+            return False
+        self._apply(*loaded)
+        return True
+
+    async def save(self):
+        """Salva lo stato di scheduling senza perdere watch/unwatch degli altri worker"""
+        await self._update(lambda entries: None)
+
+    async def _update(self, change: Callable[[Dict[str, dict]], Any]) -> Any:
+        """
+        Read-modify-write della watchlist: `change` modifica le voci (dict serializzabili).
+        Lock e I/O su file girano in un thread; la watchlist in memoria viene
+        ricostruita solo qui, sul loop, mentre lo scheduler non la sta scorrendo.
+        """
+        snapshot = {key: item.dump() for key, item in self.watchlist.items()}
+        if self.path is None:
+            result = change(snapshot)
+            self._apply(snapshot, None)
+            return result
+        entries, mtime, result = await asyncio.to_thread(self._locked_update, snapshot, self.scheduling, change)
+        self._apply(entries, mtime)
+        return result
+
+    def _locked_update(self, snapshot: Dict[str, dict], scheduling: bool, change) -> Tuple[Dict[str, dict], int, Any]:
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            loaded = self._read_if_changed(None)
+            entries = loaded[0] if loaded is not None else snapshot
+            if loaded is not None and scheduling:
+                # chi schedula ha lo stato più recente: dal file solo le voci e la loro definizione
+                for key, data in entries.items():
+                    if key in snapshot:
+                        entries[key] = {**snapshot[key], **{field: data.get(field) for field in WATCH_DEFINITION}}
+            result = change(entries)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(list(entries.values()), f)
+            os.replace(tmp, self.path)
+            return entries, os.stat(self.path).st_mtime_ns, result
+
+    def _read_if_changed(self, mtime: Optional[int]) -> Optional[Tuple[Dict[str, dict], int]]:
+        """(voci, mtime) del file, oppure None se assente, illeggibile o invariato"""
+        try:
+            with open(self.path) as f:
+                current = os.fstat(f.fileno()).st_mtime_ns
+                if current == mtime:
+                    return None
+                entries = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Watchlist not readable: {e}")
+            return None
+        return {data["key"]: data for data in entries}, current
+
+    def _apply(self, entries: Dict[str, dict], mtime: Optional[int]):
+        watchlist = {}
+        for key, data in entries.items():
+            item = self.watchlist.get(key)
+            if item is not None and self.scheduling:
+                item.query, item.sources, item.base_interval = (data[field] for field in WATCH_DEFINITION)
+            else:
+                item = WatchItem.restore(data)
+            watchlist[key] = item
+        self.watchlist = watchlist
+        self._mtime = mtime
+
+    # === WATCHLIST ===
+
+    @staticmethod
+    def watch_key(query: str, barcode: Optional[str]) -> str:
+        return barcode or f"q:{normalize_query(query)}"
+
+    async def watch(
+        self,
+        query: str,
+        barcode: Optional[str] = None,
+        sources: Optional[List[str]] = None,
+        interval: Optional[float] = None
+    ) -> WatchItem:
+        """Aggiunge (o aggiorna) un prodotto alla watchlist"""
+        key = self.watch_key(query, barcode)
+
+        def change(entries: Dict[str, dict]):
+            entry = entries.get(key)
+            if entry is None:
+                entries[key] = WatchItem(
+                    key=key,
+                    query=query,
+                    barcode=barcode,
+                    sources=sources,
+                    base_interval=interval or self.default_interval
+                ).dump()
+                return
+            entry["query"] = query or entry["query"]
+            entry["sources"] = sources
+            if interval:
+                entry["base_interval"] = interval
+
+        await self._update(change)
+        return self.watchlist[key]
+
+    async def unwatch(self, key: str) -> bool:
+        return await self._update(lambda entries: entries.pop(key, None) is not None)
+
+    def describe(self, item: WatchItem) -> dict:
+        return item.to_dict(self.min_interval, self.max_interval)
+
+    # === SCHEDULER ===
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Price tracker started ({len(self.watchlist)} watched)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                self.scheduling = self.store.acquire()
+                if self.scheduling:
+                    await self.load()  # watch/unwatch ricevuti dagli altri worker
+                    await self.run_due()
+                    self.store.flush()
+                    await self.save()
+                else:
+                    # storico e watchlist sono aggiornati da un altro worker: qui si rileggono soltanto
+                    self.store.load()
+                    await self.load()
+            except Exception as e:
+                logger.error(f"Price tracker run failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    def due_items(self) -> List[WatchItem]:
+        """Prodotti da aggiornare, dal più urgente"""
+        now = time.monotonic()
+        scored = [
+            (item.staleness(now, self.min_interval, self.max_interval) * (1 + VOLATILITY_WEIGHT * item.volatility), item)
+            for item in self.watchlist.values()
+            if item.staleness(now, self.min_interval, self.max_interval) >= 1
+        ]
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [item for _, item in scored]
+
+    async def run_due(self) -> int:
+        """Un giro dello scheduler; restituisce i prodotti aggiornati"""
+        self.runs += 1
+        batch = self.due_items()[:self.batch_size]
+        if not batch:
+            return 0
+        refreshed = await asyncio.gather(*(self.refresh(item) for item in batch))
+        return sum(refreshed)
+
+    def _available_sources(self, item: WatchItem) -> List[str]:
+        candidates = item.sources or [adapter.id for adapter in list_sources()]
+        available = []
+        for source in candidates:
+            if get_source(source) is None:
+                continue
+            if scraper_service.health.breaker(source).retry_in():
+                continue
+            if not scraper_service.governor.has_capacity(source):
+                continue
+            available.append(source)
+        return available
+
+    async def refresh(self, item: WatchItem) -> bool:
+        """Aggiorna un prodotto; False se rimandato per mancanza di budget"""
+        sources = self._available_sources(item)
+        if not sources:
+            self.deferred += 1
+            return False
+
+        # Sempre uno scraping nuovo: la cache (anche stale) ha TTL più lunghi dell'intervallo
+        # minimo di tracking e registrerebbe prezzi vecchi con l'ora del controllo.
+        # Il risultato aggiorna comunque la cache per le ricerche degli utenti.
+        results = await scraper_service.search_all_sources(
+            query=item.query,
+            barcode=item.barcode,
+            sources=sources,
+            use_cache=False
+        )
+        item.last_checked = time.monotonic()
+        item.checks += 1
+        self.refreshes += 1
+
+        succeeded = [r for r in results if r.success]
+        item.consecutive_errors = 0 if succeeded else item.consecutive_errors + 1
+
+        max_change = 0.0
+        for result in succeeded:
+            if not result.results:
+                continue
+            best = min(result.results, key=lambda r: r.price)
+            previous = item.last_prices.get(result.source)
+            if previous:
+                max_change = max(max_change, abs(best.price - previous) / previous)
+            item.last_prices[result.source] = best.price
+            if self.store.record(item.key, result.source, best.price, best.availability.value, result.scraped_at):
+                item.changes += 1
+
+        if succeeded:
+            item.volatility = VOLATILITY_ALPHA * max_change + (1 - VOLATILITY_ALPHA) * item.volatility
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "scheduling": self.scheduling,
+            "watched": len(self.watchlist),
+            "due": len(self.due_items()),
+            "runs": self.runs,
+            "refreshes": self.refreshes,
+            "deferred": self.deferred,
+            "store": self.store.stats(),
+        }
+
+
+# Singleton instance
+price_tracker = PriceTracker(
+    store=price_history_store,
+    tick=settings.TRACKING_TICK,
+    default_interval=settings.TRACKING_DEFAULT_INTERVAL,
+    min_interval=settings.TRACKING_MIN_INTERVAL,
+    max_interval=settings.TRACKING_MAX_INTERVAL,
+    batch_size=settings.TRACKING_BATCH_SIZE
+)
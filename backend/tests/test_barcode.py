@@ -0,0 +1,15 @@
+from app.services.catalog.barcode import classify
+
+
+def test_gs1_codes_are_checked():
+    assert classify("8001234567897") == ("EAN-13", "8001234567897", None)
+    assert classify("012345678905") == ("UPC-A", "0012345678905", None)
+    assert classify("10012345678902") == ("GTIN-14", "10012345678902", None)
+    assert classify("10012345678903")[2] == "Cifra di controllo non valida"
+
+
+def test_other_codes_pass_through():
+    assert classify("123456") == ("CODE128", "123456", None)
+    assert classify("0001234567890123") == ("CODE128", "0001234567890123", None)
+    assert classify(" ABC-123 ") == ("CODE128", "ABC-123", None)
+    assert classify("  ")[2] == "Barcode vuoto"
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from app.services.tracking.history_store import PriceHistoryStore
+
+
+def test_late_point_in_sealed_month_is_kept():
+    store = PriceHistoryStore()
+    assert store.record("p1", "amazon", 10.0, "in_stock", datetime(2024, 1, 10))
+    assert store.record("p1", "amazon", 11.0, "in_stock", datetime(2024, 2, 5))
+    assert store.record("p1", "amazon", 12.0, "in_stock", datetime(2024, 3, 1))  # sigilla gen e feb
+
+    # un'altra fonte registra in ritardo un punto di gennaio, mese già sigillato
+    assert store.record("p1", "eprice", 9.5, "in_stock", datetime(2024, 1, 20))
+
+    cols = store.columns("p1")
+    assert store.stats()["points"] == 4
+    assert cols["ts"].size == 4
+    assert list(cols["price"]) == [10.0, 9.5, 11.0, 12.0]
+    assert store.stats()["sealed_partitions"] == 2
+
+    history = store.history("p1", days=100_000, source="eprice")
+    assert [(h["date"], h["price"]) for h in history] == [("2024-01-20T00:00:00", 9.5)]
+
+
+def test_sealed_month_accepts_further_late_points():
+    store = PriceHistoryStore()
+    store.record("p1", "amazon", 10.0, "in_stock", datetime(2024, 1, 10))
+    store.record("p1", "amazon", 12.0, "in_stock", datetime(2024, 2, 1))
+    store.record("p1", "eprice", 9.0, "in_stock", datetime(2024, 1, 15))
+    store.record("p1", "eprice", 9.0, "in_stock", datetime(2024, 1, 16))  # invariato: nessun punto
+    store.record("p1", "eprice", 8.0, "out_of_stock", datetime(2024, 1, 17))
+
+    cols = store.columns("p1", source="eprice")
+    assert list(cols["price"]) == [9.0, 8.0]
+    assert store.stats()["points"] == 4
+    assert store.aggregate("p1", days=100_000)["min_price"] == 8.0
+
+
+def _fill(store):
+    store.record("p1", "amazon", 10.0, "in_stock", datetime(2024, 1, 10))
+    store.record("p1", "eprice", 9.0, "limited", datetime(2024, 1, 12))
+    store.record("p1", "amazon", 11.0, "in_stock", datetime(2024, 2, 5))  # sigilla gennaio
+    store.record("q:tv 55", "amazon", 400.0, "in_stock", datetime(2024, 2, 6))
+
+
+def test_history_survives_restart(tmp_path):
+    store = PriceHistoryStore()
+    assert store.open(str(tmp_path))
+    _fill(store)
+    store.close()
+
+    reloaded = PriceHistoryStore()
+    assert reloaded.open(str(tmp_path))
+    assert reloaded.history("p1", days=100_000) == store.history("p1", days=100_000)
+    assert reloaded.history("q:tv 55", days=100_000) == store.history("q:tv 55", days=100_000)
+    assert reloaded.stats()["sealed_partitions"] == 1
+    assert reloaded.rollup("p1", "day", days=100_000) == store.rollup("p1", "day", days=100_000)
+    assert reloaded.last_checked("p1") == store.last_checked("p1")
+
+    # l'ultimo punto è ricostruito: un prezzo invariato non genera un nuovo punto
+    assert not reloaded.record("p1", "amazon", 11.0, "in_stock", datetime(2024, 2, 6))
+    assert reloaded.record("p1", "amazon", 12.0, "in_stock", datetime(2024, 2, 7))
+    reloaded.close()
+
+
+def test_single_writer_and_followers_reload(tmp_path):
+    writer = PriceHistoryStore()
+    follower = PriceHistoryStore()
+    assert writer.open(str(tmp_path))
+    assert not follower.open(str(tmp_path))
+
+    _fill(writer)
+    assert follower.flush() == 0
+    writer.flush()
+    assert follower.load() > 0
+    assert follower.history("p1", days=100_000) == writer.history("p1", days=100_000)
+    assert follower.load() == 0  # nessun file modificato
+
+    writer.close()
+    assert follower.acquire()
+    follower.close()
+
+
+def test_window_carries_forward_price_in_force():
+    store = PriceHistoryStore()
+    now = datetime.utcnow()
+    store.record("p1", "amazon", 10.0, "in_stock", now - timedelta(days=200))
+    store.record("p1", "amazon", 12.0, "in_stock", now - timedelta(days=100))
+    store.record("p1", "eprice", 11.0, "in_stock", now - timedelta(days=80))
+    store.record("p1", "eprice", 9.0, "in_stock", now - timedelta(days=5))
+
+    history = store.history("p1", days=30)
+    assert [(h["source"], h["price"]) for h in history] == [("amazon", 12.0), ("eprice", 11.0), ("eprice", 9.0)]
+    assert history[0]["date"] == history[1]["date"]  # entrambe a inizio finestra
+
+    raw = store.aggregate("p1", days=30)
+    daily = store.aggregate("p1", days=30, resolution="day")
+    assert raw["current_price"] == daily["current_price"] == 9.0
+    assert raw["max_price"] == daily["max_price"] == 12.0
+
+    only_amazon = store.aggregate("p1", days=30, source="amazon")
+    assert only_amazon["current_price"] == 12.0 and only_amazon["points"] == 1
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from app.services.tracking.history_store import PriceHistoryStore
+from app.services.tracking.price_tracker import PriceTracker
+
+
+def _tracker(path):
+    tracker = PriceTracker(
+        store=PriceHistoryStore(),
+        tick=30,
+        default_interval=3600,
+        min_interval=60,
+        max_interval=86400,
+        batch_size=4
+    )
+    tracker.open(str(path))
+    return tracker
+
+
+def test_watchlist_survives_restart(tmp_path):
+    path = tmp_path / "watchlist.json"
+
+    async def scenario():
+        tracker = _tracker(path)
+        tracker.scheduling = True
+        item = await tracker.watch("TV 55 pollici", barcode="8001234567890", sources=["amazon"], interval=1800)
+        await tracker.watch("cuffie bluetooth")
+        item.last_checked = time.monotonic() - 600
+        item.last_prices["amazon"] = 399.0
+        await tracker.save()
+
+    asyncio.run(scenario())
+    reloaded = _tracker(path)
+    assert set(reloaded.watchlist) == {"8001234567890", "q:cuffie bluetooth"}
+    restored = reloaded.watchlist["8001234567890"]
+    assert restored.sources == ["amazon"]
+    assert restored.base_interval == 1800
+    assert restored.last_prices == {"amazon": 399.0}
+    assert 590 <= time.monotonic() - restored.last_checked <= 610
+    assert reloaded.watchlist["q:cuffie bluetooth"].last_checked is None
+
+
+def test_watch_and_unwatch_from_other_workers_are_merged(tmp_path):
+    path = tmp_path / "watchlist.json"
+
+    async def scenario():
+        scheduler = _tracker(path)
+        scheduler.scheduling = True
+        await scheduler.watch("monitor 27")
+        await scheduler.watch("tastiera")
+        other = _tracker(path)
+
+        await other.watch("mouse wireless")
+        assert await other.unwatch("q:monitor 27")
+        assert not await other.unwatch("q:monitor 27")
+
+        scheduler.watchlist["q:tastiera"].checks = 5
+        await scheduler.save()
+        assert set(scheduler.watchlist) == {"q:tastiera", "q:mouse wireless"}
+        assert await other.load()
+        assert other.watchlist["q:tastiera"].checks == 5
+        assert not await other.load()  # file invariato
+
+    asyncio.run(scenario())
+
+
+def test_watchlist_without_file_stays_in_memory():
+    async def scenario():
+        tracker = PriceTracker(PriceHistoryStore(), 30, 3600, 60, 86400, 4)
+        item = await tracker.watch("monitor 27", interval=600)
+        assert tracker.watchlist == {"q:monitor 27": item}
+        assert await tracker.unwatch("q:monitor 27")
+        assert not await tracker.load()
+
+    asyncio.run(scenario())
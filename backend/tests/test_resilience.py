@@ -0,0 +1,27 @@
+import time
+
+from app.services.scraper.resilience import BREAKER_HALF_OPEN, CircuitBreaker
+
+
+def _half_open() -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 61
+    return breaker
+
+
+def test_only_one_trial_when_half_open():
+    breaker = _half_open()
+    assert breaker.allow()
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_released_trial_lets_the_next_request_probe():
+    breaker = _half_open()
+    assert breaker.allow()
+    breaker.release_trial()
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
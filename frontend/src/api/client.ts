@@ -19,8 +19,8 @@ export const quotesApi = {
     })
   },
   
-  list: async (status?: string) => {
-    const params = status ? { status } : {}
+  list: async (status?: string, cursor?: string) => {
+    const params = { ...(status ? { status } : {}), ...(cursor ? { cursor } : {}) }
     return api.get('/quotes/', { params })
   },
   
@@ -83,8 +83,8 @@ export const reportsApi = {
     return api.get(`/reports/${id}`)
   },
   
-  list: async (quoteId?: number) => {
-    const params = quoteId ? { quote_id: quoteId } : {}
+  list: async (quoteId?: number, cursor?: string) => {
+    const params = { ...(quoteId ? { quote_id: quoteId } : {}), ...(cursor ? { cursor } : {}) }
     return api.get('/reports/', { params })
   },
   
@@ -30,7 +30,7 @@ const activeRequests = [
   {
     id: 1,
     productName: 'Mouse Logitech MX Master 3',
-    productCode: 'EAN 5099206085972',
+    productCode: 'EAN 5099206085978',
     quantity: 5,
     suppliersTotal: 10,
     suppliersResponded: 5,
@@ -57,7 +57,7 @@ const activeRequests = [
   {
     id: 3,
     productName: 'Monitor Dell 27" UltraSharp',
-    productCode: 'EAN 5099206085972',
+    productCode: 'EAN 5099206085978',
     quantity: 2,
     suppliersTotal: 6,
     suppliersResponded: 4,